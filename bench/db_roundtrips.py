@@ -0,0 +1,122 @@
+"""Compare the OAuth code flow before and after query consolidation.
+
+Needs a database with the migrations applied:
+
+    DATABASE_URL=postgresql://... python -m bench.db_roundtrips -n 2000
+
+The old flow is SELECT state, save_oauth_token, delete_oauth_state (three
+round trips after the code exchange); the new one is
+get_pending_oauth_state + complete_oauth_connection (two). Each runs with
+asyncpg's statement cache on and off to show what preparing saves.
+Rows are written under negative user ids and removed afterwards.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta, timezone
+
+from config import OAUTH_STATE_TTL
+from db.connection import close_pool, get_pool, init_pool
+from db.queries import (
+    complete_oauth_connection,
+    create_oauth_state,
+    delete_oauth_state,
+    get_pending_oauth_state,
+    save_oauth_token,
+)
+
+TOKENS = {
+    "access_token": "bench-access",
+    "refresh_token": "bench-refresh",
+    "expires_at": datetime.now(timezone.utc) + timedelta(hours=1),
+}
+
+
+def email(user_id: int) -> str:
+    # One Google account per flow, so they don't wait on each other's row
+    return f"bench{user_id}@example.com"
+
+
+async def old_flow(user_id: int) -> None:
+    row = await get_pool().fetchrow(
+        """
+        SELECT state FROM oauth_states
+        WHERE user_id = $1 AND chat_id = $2 AND topic_id IS NOT DISTINCT FROM $3
+        ORDER BY created_at DESC
+        LIMIT 1
+        """,
+        user_id,
+        user_id,
+        None,
+    )
+    await save_oauth_token(user_id, user_id, None, TOKENS, email(user_id))
+    await delete_oauth_state(row["state"])
+
+
+async def new_flow(user_id: int) -> None:
+    await get_pending_oauth_state(user_id, user_id, None, OAUTH_STATE_TTL)
+    await complete_oauth_connection(user_id, user_id, None, TOKENS, email(user_id))
+
+
+async def measure(
+    flow: Callable[[int], Awaitable[None]], iterations: int, concurrency: int
+) -> tuple[list[float], float]:
+    """Run `flow` for fresh pending states; returns latencies and wall time."""
+    user_ids = range(-1, -1 - iterations, -1)
+    await asyncio.gather(
+        *(create_oauth_state(u, u, None, f"bench{u}") for u in user_ids)
+    )
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(user_id: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await flow(user_id)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(u) for u in user_ids))
+    return latencies, time.perf_counter() - started
+
+
+async def cleanup() -> None:
+    pool = get_pool()
+    await pool.execute("DELETE FROM oauth_states WHERE user_id < 0")
+    await pool.execute(
+        "DELETE FROM google_accounts WHERE email LIKE 'bench-%@example.com'"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=1000, help="flows per variant")
+    parser.add_argument("-c", type=int, default=10, help="concurrent flows")
+    args = parser.parse_args()
+
+    print(f"{'variant':<28}{'total s':>9}{'p50 ms':>9}{'p99 ms':>9}")
+    for cache_size in (0, 256):
+        await init_pool(min_size=1, max_size=args.c, statement_cache_size=cache_size)
+        try:
+            for name, flow in (
+                ("3 round trips", old_flow),
+                ("2 round trips", new_flow),
+            ):
+                await cleanup()
+                latencies, total = await measure(flow, args.n, args.c)
+                cuts = statistics.quantiles(latencies, n=100)
+                label = f"{name}, cache={cache_size}"
+                print(
+                    f"{label:<28}{total:>9.2f}"
+                    f"{cuts[49] * 1000:>9.2f}{cuts[98] * 1000:>9.2f}"
+                )
+            await cleanup()
+        finally:
+            await close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
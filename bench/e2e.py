@@ -0,0 +1,316 @@
+"""End-to-end upload benchmark against fake Telegram and Drive servers.
+
+Runs the real dispatcher, router, job queue and workers in this process;
+the Bot API and Drive are served by bench.fakes in a child process, so the
+peak RSS reported is the bot's own. Needs a Postgres with the migrations
+applied (e.g. `docker compose up -d db`):
+
+    DATABASE_URL=postgresql://... python -m bench.e2e --mix mixed -n 500
+
+Results are written to bench/results/ as JSON; pass --compare with an
+earlier file to print the change. Peak RSS is per process, so run one mix
+per invocation. With --processes N updates are routed to N shard processes
+as with BOT_PROCESSES, and the largest shard's peak RSS is reported too.
+--bulk N first queues N large files from one extra chat, to check that the
+other chats' small files still go through quickly (small_latency_*).
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import aiohttp
+
+from bench.fakes import serve
+from bench.updates import make_document, make_update, synthetic_updates
+
+KB = 1024
+MB = 1024 * KB
+# File sizes are drawn uniformly from each list
+MIXES = {
+    "small": [64 * KB],
+    "mixed": [64 * KB] * 6 + [1 * MB] * 3 + [8 * MB],
+    "large": [19 * MB],
+}
+# Synthetic users/chats live far above real Telegram ids
+FIRST_CHAT_ID = 10**13
+# Files up to this size count as small in the latency breakdown
+SMALL_FILE_SIZE = 1 * MB
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def configure(host: str, telegram_port: int, drive_port: int) -> None:
+    """Point the bot at the fakes and lift rate limits meant for real APIs.
+
+    Must run before anything imports config. Values already set in the
+    environment win, so individual settings can be benchmarked.
+    """
+    defaults = {
+        "BOT_TOKEN": "1:bench",
+        "TELEGRAM_API_URL": f"http://{host}:{telegram_port}",
+        "DRIVE_API_URL": f"http://{host}:{drive_port}/drive/v3",
+        "DRIVE_UPLOAD_URL": f"http://{host}:{drive_port}/upload/drive/v3",
+        "OUTBOX_GROUP_INTERVAL": "0",
+        "OUTBOX_PRIVATE_INTERVAL": "0",
+        "OUTBOX_GLOBAL_RATE": "100000",
+        "DRIVE_ACCOUNT_RATE": "100000",
+        "DRIVE_ACCOUNT_BURST": "100000",
+        "JOB_POLL_INTERVAL": "0.2",
+        "METRICS_PORT": "0",
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+
+
+async def seed_tokens(chats: int) -> None:
+    from db.queries import save_oauth_token
+
+    tokens = {
+        "access_token": "bench",
+        "refresh_token": "bench",
+        "expires_at": datetime.now(timezone.utc) + timedelta(days=1),
+    }
+    for chat_id in range(FIRST_CHAT_ID, FIRST_CHAT_ID + chats):
+        await save_oauth_token(
+            chat_id, chat_id, None, tokens, f"bench-{chat_id}@example.com"
+        )
+
+
+async def cleanup() -> None:
+    from db.connection import get_pool
+
+    pool = get_pool()
+    await pool.execute("DELETE FROM upload_jobs WHERE chat_id >= $1", FIRST_CHAT_ID)
+    await pool.execute("DELETE FROM uploads WHERE chat_id >= $1", FIRST_CHAT_ID)
+    await pool.execute("DELETE FROM upload_stats WHERE chat_id >= $1", FIRST_CHAT_ID)
+    await pool.execute(
+        "DELETE FROM google_accounts WHERE email LIKE 'bench-%@example.com'"
+    )
+    await pool.execute(
+        "DELETE FROM uploaded_files WHERE account_email LIKE 'bench-%@example.com'"
+    )
+
+
+async def wait_for(url: str, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(url):
+                    return
+            except aiohttp.ClientError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+
+
+def percentiles(values: list[float]) -> list[float]:
+    return statistics.quantiles(values, n=100) if len(values) > 1 else [0] * 99
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from aiogram import Dispatcher
+
+    from db.connection import close_pool, get_pool, init_pool
+    from bot.handlers import router
+    from bot.media_groups import flush_media_groups
+    from bot.outbox import flush_outbox
+    from bot.sharding import ShardRouter
+    from bot.workers import start_workers, stop_workers
+    from main import create_bot, run_shard
+    from services.drive_client import close_session, init_session
+    from services.executor import init_executor, shutdown_executor
+    from services.upload_history import start_history_writer, stop_history_writer
+
+    telegram = os.environ["TELEGRAM_API_URL"]
+    await wait_for(f"{telegram}/bench/stats")
+
+    await init_pool()
+    await cleanup()
+    await seed_tokens(args.chats + 1)
+    init_executor()
+    await init_session()
+    bot = create_bot()
+    dp = Dispatcher()
+    dp.include_router(router)
+
+    bulk_chat = FIRST_CHAT_ID + args.chats
+    updates = [
+        make_update(bulk_chat, bulk_chat, document=make_document(19 * MB))
+        for _ in range(args.bulk)
+    ]
+    updates += synthetic_updates(
+        args.count, args.chats, "document", MIXES[args.mix], FIRST_CHAT_ID
+    )
+    sizes = {
+        u["message"]["document"]["file_name"]: u["message"]["document"]["file_size"]
+        for u in updates
+    }
+
+    shards = None
+    if args.processes > 1:
+        shards = ShardRouter(run_shard, args.processes)
+        dp.update.outer_middleware(shards)
+        await shards.start()
+    else:
+        start_history_writer()
+        start_workers(bot)
+    polling = asyncio.create_task(
+        dp.start_polling(
+            bot,
+            handle_as_tasks=shards is None,
+            handle_signals=False,
+            close_bot_session=False,
+        )
+    )
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{telegram}/bench/updates", json=updates) as response:
+            response.raise_for_status()
+
+        deadline = time.monotonic() + args.timeout
+        while True:
+            await asyncio.sleep(0.5)
+            async with session.get(f"{telegram}/bench/stats") as response:
+                stats = await response.json()
+            if len(stats["finished"]) >= len(updates) or time.monotonic() > deadline:
+                break
+
+    await dp.stop_polling()
+    await polling
+    if shards is not None:
+        await shards.stop(30)
+    await flush_media_groups()
+    await stop_workers(0)
+    await stop_history_writer(10)
+    history_rows = await get_pool().fetchval(
+        "SELECT count(*) FROM uploads WHERE chat_id >= $1", FIRST_CHAT_ID
+    )
+    await flush_outbox(1)
+    await bot.session.close()
+    await close_session()
+    shutdown_executor()
+    await cleanup()
+    await close_pool()
+
+    finished = stats["finished"]
+    delivered = stats["delivered"]
+    latencies = {
+        name: result["at"] - delivered[name]
+        for name, result in finished.items()
+        if result["ok"] and name in delivered
+    }
+    small = [t for name, t in latencies.items() if sizes[name] <= SMALL_FILE_SIZE]
+    ok_names = [name for name, result in finished.items() if result["ok"]]
+    span = (
+        max(result["at"] for result in finished.values()) - min(delivered.values())
+        if finished
+        else 0
+    )
+    uploaded_bytes = sum(sizes[name] for name in ok_names)
+    cuts = percentiles(list(latencies.values()))
+    small_cuts = percentiles(small)
+    result = {
+        "mix": args.mix,
+        "count": len(updates),
+        "chats": args.chats,
+        "bulk": args.bulk,
+        "processes": args.processes,
+        "workers": int(os.environ.get("UPLOAD_WORKERS", "8")),
+        "uploaded": len(ok_names),
+        "failed": len(finished) - len(ok_names),
+        "history_rows": history_rows,
+        "unfinished": len(updates) - len(finished),
+        "seconds": round(span, 3),
+        "uploads_per_second": round(len(ok_names) / span, 2) if span else 0,
+        "mb_per_second": round(uploaded_bytes / MB / span, 2) if span else 0,
+        "latency_p50": round(cuts[49], 4),
+        "latency_p95": round(cuts[94], 4),
+        "latency_p99": round(cuts[98], 4),
+        "small_latency_p50": round(small_cuts[49], 4),
+        "small_latency_p95": round(small_cuts[94], 4),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / KB, 1
+        ),
+    }
+    if shards is not None:
+        # Only stopped (waited for) children count, i.e. the shards
+        result["peak_shard_rss_mb"] = round(
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / KB, 1
+        )
+    return result
+
+
+def report(result: dict, baseline: dict | None) -> None:
+    keys = (
+        "uploads_per_second",
+        "mb_per_second",
+        "latency_p50",
+        "latency_p95",
+        "latency_p99",
+        "small_latency_p50",
+        "small_latency_p95",
+        "peak_rss_mb",
+        "peak_shard_rss_mb",
+    )
+    print(
+        f"{result['uploaded']} uploaded, {result['failed']} failed, "
+        f"{result['unfinished']} unfinished in {result['seconds']}s "
+        f"({result['mix']} mix, {result['chats']} chats, "
+        f"{result['processes']} processes)"
+    )
+    for key in keys:
+        if key not in result:
+            continue
+        line = f"  {key:<20}{result[key]:>10}"
+        if baseline and baseline.get(key):
+            change = (result[key] - baseline[key]) / baseline[key] * 100
+            line += f"  ({change:+.1f}% vs {baseline[key]})"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("-n", "--count", type=int, default=500)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--bulk", type=int, default=0, help="large files queued first")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--telegram-port", type=int, default=18081)
+    parser.add_argument("--drive-port", type=int, default=18082)
+    parser.add_argument("--compare", type=Path, help="earlier result to diff against")
+    args = parser.parse_args()
+
+    configure(args.host, args.telegram_port, args.drive_port)
+    fakes = multiprocessing.get_context("spawn").Process(
+        target=serve,
+        args=(args.host, args.telegram_port, args.drive_port),
+        daemon=True,
+    )
+    fakes.start()
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        fakes.terminate()
+
+    result["date"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    RESULTS_DIR.mkdir(exist_ok=True)
+    path = RESULTS_DIR / f"{result['date'].replace(':', '')}-{args.mix}.json"
+    path.write_text(json.dumps(result, indent=2) + "\n")
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    report(result, baseline)
+    print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
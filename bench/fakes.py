@@ -0,0 +1,206 @@
+"""Local stand-ins for the Telegram Bot API and Google Drive v3.
+
+Only what the upload path uses is implemented. Neither server keeps file
+contents: downloads are generated from a fixed block and uploads are
+counted and dropped, so the fakes use little memory whatever the file mix.
+"""
+
+import asyncio
+import itertools
+import re
+import time
+import uuid
+
+from aiohttp import web
+
+_BLOCK = b"\0" * (64 * 1024)
+_QUEUED = re.compile(r"Queued (\S+) for upload")
+# Status edits of a job that is still going to be uploaded
+_PENDING = re.compile(r"retrying|is queued")
+
+
+class FakeTelegram:
+    """Serves getUpdates from a loaded update list and records bot replies.
+
+    Per file it tracks when the update was delivered and when the bot
+    reported the final outcome on the file's status message.
+    """
+
+    def __init__(self) -> None:
+        self.updates: list[dict] = []
+        self.delivered: dict[str, float] = {}  # file name -> time
+        self.finished: dict[str, tuple[float, bool]] = {}  # -> (time, ok)
+        self.status_files: dict[int, str] = {}  # status message id -> file name
+        self.message_ids = itertools.count(1)
+        self.new_updates = asyncio.Event()
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.api)
+        app.router.add_get("/file/bot{token}/{path:.+}", self.download)
+        app.router.add_post("/bench/updates", self.load)
+        app.router.add_get("/bench/stats", self.stats)
+        return app
+
+    async def load(self, request: web.Request) -> web.Response:
+        self.updates.extend(await request.json())
+        self.new_updates.set()
+        return web.json_response({"queued": len(self.updates)})
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "delivered": self.delivered,
+                "finished": {
+                    name: {"at": at, "ok": ok}
+                    for name, (at, ok) in self.finished.items()
+                },
+            }
+        )
+
+    async def api(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        handler = getattr(self, f"_{method}", None)
+        result = await handler(params) if handler else True
+        return web.json_response({"ok": True, "result": result})
+
+    async def _getMe(self, params: dict) -> dict:
+        return {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench"}
+
+    async def _getUpdates(self, params: dict) -> list[dict]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        self.updates = [u for u in self.updates if u["update_id"] >= offset]
+        if not self.updates:
+            self.new_updates.clear()
+            try:
+                await asyncio.wait_for(self.new_updates.wait(), timeout=1)
+            except TimeoutError:
+                return []
+        batch = self.updates[:limit]
+        now = time.time()
+        for update in batch:
+            document = update.get("message", {}).get("document")
+            if document:
+                self.delivered.setdefault(document["file_name"], now)
+        return batch
+
+    async def _getFile(self, params: dict) -> dict:
+        file_id = params["file_id"]
+        return {
+            "file_id": file_id,
+            "file_unique_id": file_id,
+            "file_size": int(file_id.split("-")[1]),
+            "file_path": f"documents/{file_id}",
+        }
+
+    async def _sendMessage(self, params: dict) -> dict:
+        message_id = next(self.message_ids)
+        match = _QUEUED.match(params.get("text", ""))
+        if match:
+            self.status_files[message_id] = match.group(1)
+        chat_id = int(params["chat_id"])
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": "Load"},
+            "text": params.get("text", ""),
+        }
+
+    async def _editMessageText(self, params: dict) -> bool:
+        name = self.status_files.get(int(params["message_id"]))
+        text = params.get("text", "")
+        if name is None or name in self.finished:
+            return True
+        if text.startswith("Uploaded to Google Drive"):
+            self.finished[name] = (time.time(), True)
+        elif not text.startswith("Uploading") and not _PENDING.search(text):
+            self.finished[name] = (time.time(), False)
+        return True
+
+    async def download(self, request: web.Request) -> web.StreamResponse:
+        # File ids look like bench-<size>-<n>, see bench.updates.make_document
+        size = int(request.match_info["path"].rsplit("/", 1)[-1].split("-")[1])
+        response = web.StreamResponse(headers={"Content-Length": str(size)})
+        await response.prepare(request)
+        remaining = size
+        while remaining > 0:
+            block = _BLOCK[: min(remaining, len(_BLOCK))]
+            await response.write(block)
+            remaining -= len(block)
+        await response.write_eof()
+        return response
+
+
+class FakeDrive:
+    """Resumable uploads that count bytes and discard them."""
+
+    def __init__(self) -> None:
+        self.sessions: dict[str, int] = {}  # session id -> bytes received
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_get("/drive/v3/files", self.list_files)
+        app.router.add_post("/drive/v3/files", self.create)
+        app.router.add_get("/drive/v3/files/{file_id}", self.get)
+        app.router.add_post("/upload/drive/v3/files", self.start_upload)
+        app.router.add_put("/upload/session/{sid}", self.upload_chunk)
+        return app
+
+    async def list_files(self, request: web.Request) -> web.Response:
+        return web.json_response({"files": []})
+
+    async def create(self, request: web.Request) -> web.Response:
+        return web.json_response({"id": uuid.uuid4().hex})
+
+    async def get(self, request: web.Request) -> web.Response:
+        return web.json_response({"id": request.match_info["file_id"]})
+
+    async def start_upload(self, request: web.Request) -> web.Response:
+        await request.read()
+        sid = uuid.uuid4().hex
+        self.sessions[sid] = 0
+        location = request.url.with_path(f"/upload/session/{sid}").with_query({})
+        return web.Response(headers={"Location": str(location)})
+
+    async def upload_chunk(self, request: web.Request) -> web.Response:
+        sid = request.match_info["sid"]
+        if sid not in self.sessions:
+            return web.json_response({"error": {"code": 404}}, status=404)
+        size = 0
+        async for block in request.content.iter_any():
+            size += len(block)
+        self.sessions[sid] += size
+        total = request.headers["Content-Range"].rsplit("/", 1)[1]
+        received = self.sessions[sid]
+        if total != "*" and received == int(total):
+            del self.sessions[sid]
+            file_id = uuid.uuid4().hex
+            return web.json_response(
+                {"id": file_id, "webViewLink": f"https://drive.test/{file_id}"}
+            )
+        headers = {"Range": f"bytes=0-{received - 1}"} if received else {}
+        return web.Response(status=308, headers=headers)
+
+
+def serve(host: str, telegram_port: int, drive_port: int) -> None:
+    """Run both fakes until the process is terminated."""
+
+    async def run() -> None:
+        for app, port in (
+            (FakeTelegram().app(), telegram_port),
+            (FakeDrive().app(), drive_port),
+        ):
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            await web.TCPSite(runner, host, port).start()
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    # Standalone, e.g. for manual runs with TELEGRAM_API_URL and DRIVE_*_URL
+    # pointing here
+    serve("127.0.0.1", 8081, 8082)
@@ -0,0 +1,96 @@
+"""Measure how long the bot takes to import, with an optional budget.
+
+Each run imports `main` in a fresh interpreter, as a restart would:
+
+    python -m bench.startup -n 10 --budget 2.5
+
+Prints the median and fastest import time and the slowest modules, and
+exits with status 1 if the median exceeds --budget or a module that should
+be imported lazily (the Google client libraries) is loaded at startup, so
+it can run as a CI check.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+# Only needed for /connect and token refreshes, see services/google_auth.py
+LAZY_MODULES = (
+    "google_auth_oauthlib",
+    "google.oauth2",
+    "google.auth.transport.requests",
+    "requests",
+)
+
+_TIMED_IMPORT = """
+import sys, time
+started = time.perf_counter()
+import main
+print(time.perf_counter() - started)
+print(" ".join(sys.modules))
+"""
+
+
+def timed_import() -> tuple[float, set[str]]:
+    """Seconds to import main in a new interpreter, and the modules loaded."""
+    output = subprocess.run(
+        [sys.executable, "-c", _TIMED_IMPORT],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.splitlines()
+    return float(output[0]), set(output[1].split())
+
+
+def slowest_imports(count: int) -> list[tuple[int, str]]:
+    """Packages by total import time (their modules' own time), in microseconds."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    totals: dict[str, int] = {}
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, _, name = line.removeprefix("import time:").split("|")
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(own)
+    return sorted(((us, name) for name, us in totals.items()), reverse=True)[:count]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=5, help="imports to time")
+    parser.add_argument("--top", type=int, default=10, help="slowest to list")
+    parser.add_argument("--budget", type=float, help="max median seconds")
+    args = parser.parse_args()
+
+    # The first run may compile bytecode; don't count it
+    _, modules = timed_import()
+    times = [timed_import()[0] for _ in range(args.n)]
+    median = statistics.median(times)
+    print(f"import main: median {median:.3f}s, fastest {min(times):.3f}s")
+    for us, name in slowest_imports(args.top):
+        print(f"  {us / 1e6:8.3f}s  {name}")
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in modules]
+    if eager:
+        print(f"imported at startup but should be lazy: {', '.join(eager)}")
+        failed = True
+    if args.budget is not None and median > args.budget:
+        print(f"over budget: {median:.3f}s > {args.budget:.3f}s")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import itertools
+import random
+import time
+
+_update_ids = itertools.count(1)
+
+
+def make_update(
+    chat_id: int,
+    user_id: int,
+    text: str | None = None,
+    document: dict | None = None,
+    media_group_id: str | None = None,
+) -> dict:
+    """Build a Telegram Update payload for a private-chat message."""
+    update_id = next(_update_ids)
+    message: dict = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private", "first_name": "Load"},
+        "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+    }
+    if text is not None:
+        message["text"] = text
+        if text.startswith("/"):
+            command = text.split()[0]
+            message["entities"] = [
+                {"type": "bot_command", "offset": 0, "length": len(command)}
+            ]
+    if document is not None:
+        message["document"] = document
+    if media_group_id is not None:
+        message["media_group_id"] = media_group_id
+    return {"update_id": update_id, "message": message}
+
+
+def make_document(file_size: int) -> dict:
+    """Document payload whose file_id encodes its size for fake file servers."""
+    n = random.getrandbits(48)
+    return {
+        "file_id": f"bench-{file_size}-{n}",
+        "file_unique_id": f"u{n}",
+        "file_name": f"bench-{n}.bin",
+        "mime_type": "application/octet-stream",
+        "file_size": file_size,
+    }
+
+
+def synthetic_updates(
+    count: int,
+    chats: int,
+    kind: str,
+    file_sizes: list[int] | None = None,
+    first_chat_id: int = 1,
+) -> list[dict]:
+    """Generate `count` updates spread over `chats` chats.
+
+    `kind` is "status" for /status commands or "document" for file messages
+    with sizes drawn from `file_sizes`. Chat (and user) ids start at
+    `first_chat_id`.
+    """
+    updates = []
+    for _ in range(count):
+        chat_id = random.randint(first_chat_id, first_chat_id + chats - 1)
+        if kind == "document":
+            size = random.choice(file_sizes or [64 * 1024])
+            updates.append(make_update(chat_id, chat_id, document=make_document(size)))
+        else:
+            updates.append(make_update(chat_id, chat_id, text="/status"))
+    return updates
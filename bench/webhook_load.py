@@ -0,0 +1,74 @@
+"""Load-test a running bot in webhook mode with synthetic updates.
+
+Start the bot with BOT_MODE=webhook, then:
+
+    python -m bench.webhook_load --url http://localhost:8080/webhook -n 5000
+
+Handlers still reply through the Telegram Bot API, so point the bot at a
+stand-in API server when testing locally.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+
+from bench.updates import synthetic_updates
+
+
+async def post_updates(
+    url: str, updates: list[dict], concurrency: int, secret: str | None
+) -> list[float]:
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    latencies: list[float] = []
+    queue: asyncio.Queue[dict] = asyncio.Queue()
+    for update in updates:
+        queue.put_nowait(update)
+
+    async def sender(session: aiohttp.ClientSession) -> None:
+        while not queue.empty():
+            update = queue.get_nowait()
+            started = time.perf_counter()
+            async with session.post(url, json=update, headers=headers) as response:
+                response.raise_for_status()
+                await response.read()
+            latencies.append(time.perf_counter() - started)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(sender(session) for _ in range(concurrency)))
+    return latencies
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8080/webhook")
+    parser.add_argument("-n", "--count", type=int, default=1000)
+    parser.add_argument("-c", "--concurrency", type=int, default=40)
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--kind", choices=["status", "document"], default="status")
+    parser.add_argument("--secret")
+    args = parser.parse_args()
+
+    updates = synthetic_updates(args.count, args.chats, args.kind)
+    started = time.perf_counter()
+    latencies = await post_updates(args.url, updates, args.concurrency, args.secret)
+    elapsed = time.perf_counter() - started
+
+    print(f"updates:    {len(latencies)} in {elapsed:.2f}s")
+    print(f"throughput: {len(latencies) / elapsed:.1f} updates/s")
+    print(f"latency:    mean {statistics.mean(latencies) * 1000:.1f}ms")
+    for pct in (50, 95, 99):
+        print(f"            p{pct} {percentile(latencies, pct) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,24 @@
+from aiogram import Router
+from aiogram.filters import ExceptionTypeFilter
+from aiogram.types import ErrorEvent, Message
+
+from bot.outbox import answer
+from services.circuit_breaker import CircuitOpenError
+
+router = Router()
+
+
+@router.errors(ExceptionTypeFilter(CircuitOpenError))
+async def dependency_unavailable(event: ErrorEvent) -> None:
+    """Reply at once when a handler failed fast on an open circuit."""
+    update = event.update
+    message = update.message
+    if message is None and update.callback_query is not None:
+        message = update.callback_query.message
+    error = event.exception
+    if isinstance(message, Message) and isinstance(error, CircuitOpenError):
+        await answer(
+            message,
+            f"Can't reach {error.description} right now.\n"
+            "Please try again in a minute.",
+        )
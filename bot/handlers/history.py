@@ -0,0 +1,130 @@
+from html import escape
+
+from aiogram import F, Router
+from aiogram.filters import Command
+from aiogram.types import (
+    CallbackQuery,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    Message,
+)
+
+from config import HISTORY_PAGE_SIZE, STATS_RECENT_DAYS
+from db.queries import get_upload_history, get_upload_stats
+
+router = Router()
+
+
+def _format_size(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+async def _history_page(
+    user_id: int, chat_id: int, topic_id: int | None, before_id: int | None
+) -> tuple[str, InlineKeyboardMarkup | None]:
+    """Text of one page of /history and the button to the next one."""
+    # One extra row tells whether there is an older page
+    rows = await get_upload_history(
+        user_id, chat_id, topic_id, before_id, HISTORY_PAGE_SIZE + 1
+    )
+    if not rows:
+        location = "this topic" if topic_id else "this chat"
+        return f"No uploads from {location} yet.", None
+
+    page = rows[:HISTORY_PAGE_SIZE]
+    lines = ["Uploads, newest first:"]
+    for row in page:
+        date = row["created_at"].strftime("%d %b %H:%M")
+        name = escape(row["file_name"])
+        if row["outcome"] == "done":
+            lines.append(
+                f'{date}  <a href="{escape(row["web_view_link"])}">{name}</a> '
+                f"({_format_size(row['file_size'])})"
+            )
+        else:
+            lines.append(f"{date}  {name}: failed")
+    keyboard = None
+    if len(rows) > HISTORY_PAGE_SIZE:
+        keyboard = InlineKeyboardMarkup(
+            inline_keyboard=[
+                [
+                    InlineKeyboardButton(
+                        text="Older",
+                        callback_data=f"history:{user_id}:{page[-1]['id']}",
+                    )
+                ]
+            ]
+        )
+    return "\n".join(lines), keyboard
+
+
+@router.message(Command("history"))
+async def command_history(message: Message) -> None:
+    """List recent uploads for the current topic."""
+    if not message.from_user:
+        return
+
+    text, keyboard = await _history_page(
+        message.from_user.id, message.chat.id, message.message_thread_id, None
+    )
+    await message.answer(text, reply_markup=keyboard, disable_web_page_preview=True)
+
+
+@router.callback_query(F.data.startswith("history:"))
+async def older_history(callback: CallbackQuery) -> None:
+    """Show the next page of /history in place."""
+    message = callback.message
+    data = (callback.data or "").removeprefix("history:")
+    owner_id, _, before_id = data.partition(":")
+    # Buttons sent before they carried the owner are treated as too old
+    if not isinstance(message, Message) or not before_id:
+        await callback.answer("This message is too old, use /history again.")
+        return
+
+    # Each user's history is their own, even in a group chat
+    if int(owner_id) != callback.from_user.id:
+        await callback.answer("This isn't your history, use /history to see yours.")
+        return
+
+    text, keyboard = await _history_page(
+        callback.from_user.id,
+        message.chat.id,
+        message.message_thread_id,
+        int(before_id),
+    )
+    await message.edit_text(text, reply_markup=keyboard, disable_web_page_preview=True)
+    await callback.answer()
+
+
+@router.message(Command("stats"))
+async def command_stats(message: Message) -> None:
+    """Show upload totals for the current topic."""
+    if not message.from_user:
+        return
+
+    topic_id = message.message_thread_id
+    stats = await get_upload_stats(
+        message.from_user.id, message.chat.id, topic_id, STATS_RECENT_DAYS
+    )
+    location = "this topic" if topic_id else "this chat"
+    if not stats["uploads"] and not stats["failures"]:
+        await message.answer(f"No uploads from {location} yet.")
+        return
+
+    lines = [
+        f"Uploads to Google Drive from {location}:",
+        f"Last {STATS_RECENT_DAYS} days: {stats['recent_uploads']} files, "
+        f"{_format_size(stats['recent_bytes'])}, "
+        f"{stats['recent_failures']} failed",
+        f"All time: {stats['uploads']} files, {_format_size(stats['bytes'])}, "
+        f"{stats['failures']} failed",
+    ]
+    if stats["uploads"]:
+        lines.append(
+            f"Average upload time: {stats['duration'] / stats['uploads']:.1f}s"
+        )
+    await message.answer("\n".join(lines))
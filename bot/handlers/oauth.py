@@ -1,23 +1,35 @@
 import logging
 import secrets
+from html import escape
 
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message
+from google.auth.exceptions import RefreshError
 
+from config import OAUTH_STATE_TTL
 from db.queries import (
+    complete_oauth_connection,
     create_oauth_state,
-    delete_oauth_state,
-    save_oauth_token,
-    get_oauth_token,
     delete_oauth_token,
+    get_pending_oauth_state,
     update_folder_id,
 )
-from services.google_auth import generate_auth_url, exchange_code, get_user_email
-from services.google_drive import create_credentials, find_or_create_folder
+from services.circuit_breaker import CircuitOpenError
+from services.drive_client import get_user_email
+from services.executor import run_blocking
+from services.google_auth import generate_auth_url, exchange_code
+from services.drive_folders import resolve_folder_path, split_folder_path
+from services.rate_limit import drive_account
+from services.token_store import get_token, get_valid_token, invalidate_token
 
 router = Router()
 
+NO_PENDING_STATE = (
+    "No pending connection request found.\n"
+    "Use /connect to start the authorization process."
+)
+
 
 @router.message(Command("connect"))
 async def command_connect(message: Message) -> None:
@@ -29,9 +41,9 @@ async def command_connect(message: Message) -> None:
     chat_id = message.chat.id
     topic_id = message.message_thread_id
 
-    existing = await get_oauth_token(user_id, chat_id, topic_id)
+    existing = await get_token(user_id, chat_id, topic_id)
     if existing:
-        email = existing.get("email", "Unknown")
+        email = existing.get("email") or "Unknown"
         await message.answer(
             f"Already connected as {email}.\n"
             "Use /disconnect first if you want to connect a different account."
@@ -41,7 +53,8 @@ async def command_connect(message: Message) -> None:
     state = secrets.token_urlsafe(32)
     await create_oauth_state(user_id, chat_id, topic_id, state)
 
-    auth_url = generate_auth_url(state)
+    # The first call imports the OAuth libraries, which takes a while
+    auth_url = await run_blocking(generate_auth_url, state)
 
     await message.answer(
         "Click the link below to connect your Google Drive:\n\n"
@@ -64,6 +77,7 @@ async def command_disconnect(message: Message) -> None:
     topic_id = message.message_thread_id
 
     deleted = await delete_oauth_token(user_id, chat_id, topic_id)
+    invalidate_token(user_id, chat_id, topic_id)
 
     if deleted:
         await message.answer("Disconnected from Google Drive.")
@@ -82,46 +96,32 @@ async def handle_oauth_code(message: Message) -> None:
     chat_id = message.chat.id
     topic_id = message.message_thread_id
 
-    # Find the OAuth state for this user/chat/topic
-    # We need to check if there's a pending state for this context
-    # Since the code doesn't include the state, we look for any pending state
-    # for this user+chat+topic combination
-    from db.connection import get_pool
-
-    pool = get_pool()
-    row = await pool.fetchrow(
-        """
-        SELECT state FROM oauth_states
-        WHERE user_id = $1 AND chat_id = $2 AND topic_id IS NOT DISTINCT FROM $3
-        ORDER BY created_at DESC
-        LIMIT 1
-        """,
-        user_id,
-        chat_id,
-        topic_id,
-    )
-
-    if not row:
-        await message.answer(
-            "No pending connection request found.\n"
-            "Use /connect to start the authorization process."
-        )
+    # The code doesn't include the state, so look for any pending state
+    # for this user+chat+topic combination before calling Google
+    if not await get_pending_oauth_state(user_id, chat_id, topic_id, OAUTH_STATE_TTL):
+        await message.answer(NO_PENDING_STATE)
         return
 
-    state = row["state"]
-
     try:
-        tokens = exchange_code(code)
-        email = get_user_email(tokens["access_token"])
-
-        await save_oauth_token(user_id, chat_id, topic_id, tokens, email)
-        await delete_oauth_state(state)
+        tokens = await run_blocking(exchange_code, code)
+        email = await get_user_email(tokens["access_token"])
+
+        # Consumes the state in the same statement, so a code pasted twice
+        # can't overwrite the connection
+        if not await complete_oauth_connection(
+            user_id, chat_id, topic_id, tokens, email
+        ):
+            await message.answer(NO_PENDING_STATE)
+            return
+        invalidate_token(user_id, chat_id, topic_id)
 
         await message.answer(
-            f"Successfully connected to Google Drive as {email}!\n"
+            f"Successfully connected to Google Drive as {email or 'Unknown'}!\n"
             "You can now send files and I'll upload them to your Drive.\n\n"
             "Use /setfolder FolderName to specify a folder for uploads."
         )
+    except CircuitOpenError:
+        raise  # Answered by the errors handler
     except Exception:
         logging.exception("OAuth code exchange failed")
         await message.answer(
@@ -141,7 +141,14 @@ async def command_setfolder(message: Message) -> None:
     topic_id = message.message_thread_id
 
     # Check for active connection
-    token = await get_oauth_token(user_id, chat_id, topic_id)
+    try:
+        token = await get_valid_token(user_id, chat_id, topic_id)
+    except RefreshError:
+        await message.answer(
+            "Your Google Drive connection has expired.\n"
+            "Please use /disconnect and then /connect to reconnect."
+        )
+        return
     if not token:
         location = "this topic" if topic_id else "this chat"
         await message.answer(
@@ -150,31 +157,36 @@ async def command_setfolder(message: Message) -> None:
         )
         return
 
-    # Parse folder name from command
+    # Parse folder path from command
     parts = message.text.split(maxsplit=1)
     if len(parts) < 2:
         await message.answer(
             "Please specify a folder name.\n"
-            "Usage: /setfolder FolderName\n"
-            "Example: /setfolder MyBooks"
+            "Usage: /setfolder FolderName or /setfolder Parent/Child\n"
+            "Example: /setfolder Books/2026/Sci-Fi"
         )
         return
 
-    folder_name = parts[1].strip()
-    if not folder_name:
+    folder_path = "/".join(split_folder_path(parts[1]))
+    if not folder_path:
         await message.answer("Folder name cannot be empty.")
         return
 
-    status_msg = await message.answer(f"Setting up folder '{folder_name}'...")
+    status_msg = await message.answer(f"Setting up folder '{escape(folder_path)}'...")
 
     try:
-        credentials = create_credentials(token["access_token"], token["refresh_token"])
-        folder_id = find_or_create_folder(credentials, folder_name)
-        await update_folder_id(user_id, chat_id, topic_id, folder_id)
+        with drive_account(token.get("email")):
+            folder_id = await resolve_folder_path(
+                token["access_token"], token.get("email"), folder_path
+            )
+        await update_folder_id(user_id, chat_id, topic_id, folder_id, folder_path)
+        invalidate_token(user_id, chat_id, topic_id)
 
         await status_msg.edit_text(
-            f"Files will now be uploaded to folder '{folder_name}'."
+            f"Files will now be uploaded to folder '{escape(folder_path)}'."
         )
+    except CircuitOpenError:
+        raise  # Answered by the errors handler
     except Exception:
         logging.exception("Failed to set folder")
         await status_msg.edit_text(
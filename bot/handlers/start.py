@@ -2,7 +2,7 @@ from aiogram import Router
 from aiogram.filters import CommandStart, Command
 from aiogram.types import Message
 
-from db.queries import get_oauth_token
+from services.token_store import get_token
 
 router = Router()
 
@@ -17,7 +17,9 @@ async def command_start(message: Message) -> None:
         "Commands:\n"
         "/connect - Connect your Google Drive\n"
         "/disconnect - Disconnect your Google Drive\n"
-        "/status - Check connection status\n\n"
+        "/status - Check connection status\n"
+        "/history - Recent uploads\n"
+        "/stats - Upload totals\n\n"
         "Once connected, just send me any file and I'll upload it to your Drive."
     )
 
@@ -32,10 +34,16 @@ async def command_status(message: Message) -> None:
     chat_id = message.chat.id
     topic_id = message.message_thread_id
 
-    token = await get_oauth_token(user_id, chat_id, topic_id)
+    token = await get_token(user_id, chat_id, topic_id)
 
-    if token:
-        email = token.get("email", "Unknown")
+    if token and token.get("refresh_failed_at"):
+        email = token.get("email") or "Unknown"
+        await message.answer(
+            f"Google Drive connection for {email} has expired.\n"
+            "Use /disconnect and then /connect to reconnect."
+        )
+    elif token:
+        email = token.get("email") or "Unknown"
         await message.answer(f"Connected to Google Drive as {email}")
     else:
         location = "this topic" if topic_id else "this chat"
@@ -1,23 +1,25 @@
 import logging
-from io import BytesIO
+from html import escape
 
-from aiogram import Router, F, Bot
+from aiogram import Router, F
 from aiogram.types import Message, Document, PhotoSize, Video, Audio, Voice, VideoNote
-from google.auth.exceptions import RefreshError
 
-from db.queries import get_oauth_token, update_oauth_token
-from services.google_auth import refresh_access_token
-from services.google_drive import create_credentials, is_token_expired, upload_file
+from config import TELEGRAM_LOCAL_MODE
+from bot.media_groups import add_to_media_group
+from bot.outbox import answer, edit_message
+from bot.uploads import MAX_FILE_SIZE, transfer_memory
+from bot.workers import notify_workers
+from db.queries import enqueue_upload_jobs
+from services.memory_budget import upload_memory
+from services.token_store import get_token
 
 router = Router()
 
-MAX_FILE_SIZE = 20 * 1024 * 1024  # 20MB Telegram limit
-
 
 def get_file_info(
     message: Message,
-) -> tuple[str, str, str, int] | None:
-    """Extract file_id, name, mime_type, size from any file type."""
+) -> tuple[str, str, str, int, str] | None:
+    """Extract file_id, name, mime_type, size, file_unique_id from any file type."""
     if message.document:
         doc: Document = message.document
         return (
@@ -25,6 +27,7 @@ def get_file_info(
             doc.file_name or "document",
             doc.mime_type or "application/octet-stream",
             doc.file_size or 0,
+            doc.file_unique_id,
         )
     if message.photo:
         photo: PhotoSize = message.photo[-1]  # Largest size
@@ -33,6 +36,7 @@ def get_file_info(
             "photo.jpg",
             "image/jpeg",
             photo.file_size or 0,
+            photo.file_unique_id,
         )
     if message.video:
         video: Video = message.video
@@ -41,6 +45,7 @@ def get_file_info(
             video.file_name or "video.mp4",
             video.mime_type or "video/mp4",
             video.file_size or 0,
+            video.file_unique_id,
         )
     if message.audio:
         audio: Audio = message.audio
@@ -49,6 +54,7 @@ def get_file_info(
             audio.file_name or "audio.mp3",
             audio.mime_type or "audio/mpeg",
             audio.file_size or 0,
+            audio.file_unique_id,
         )
     if message.voice:
         voice: Voice = message.voice
@@ -57,6 +63,7 @@ def get_file_info(
             "voice.ogg",
             voice.mime_type or "audio/ogg",
             voice.file_size or 0,
+            voice.file_unique_id,
         )
     if message.video_note:
         video_note: VideoNote = message.video_note
@@ -65,31 +72,27 @@ def get_file_info(
             "video_note.mp4",
             "video/mp4",
             video_note.file_size or 0,
+            video_note.file_unique_id,
         )
     return None
 
 
-async def ensure_valid_token(
-    token: dict, user_id: int, chat_id: int, topic_id: int | None
-) -> dict:
-    """Refresh token if expired, returning updated token dict."""
-    if not is_token_expired(token.get("expires_at")):
-        return token
+@router.message(F.document | F.photo | F.video | F.audio | F.voice | F.video_note)
+async def handle_file_upload(message: Message) -> None:
+    """Queue file uploads to Google Drive."""
+    if not message.from_user:
+        return
 
-    refreshed = refresh_access_token(token["refresh_token"])
-    await update_oauth_token(
-        user_id, chat_id, topic_id, refreshed["access_token"], refreshed["expires_at"]
-    )
-    return {
-        **token,
-        "access_token": refreshed["access_token"],
-        "expires_at": refreshed["expires_at"],
-    }
+    if message.media_group_id:
+        add_to_media_group(message, queue_uploads)
+        return
 
+    await queue_uploads([message])
 
-@router.message(F.document | F.photo | F.video | F.audio | F.voice | F.video_note)
-async def handle_file_upload(message: Message, bot: Bot) -> None:
-    """Handle file uploads to Google Drive."""
+
+async def queue_uploads(messages: list[Message]) -> None:
+    """Queue the files of one message or album under a single status message."""
+    message = messages[0]
     if not message.from_user:
         return
 
@@ -97,78 +100,68 @@ async def handle_file_upload(message: Message, bot: Bot) -> None:
     chat_id = message.chat.id
     topic_id = message.message_thread_id
 
-    token = await get_oauth_token(user_id, chat_id, topic_id)
+    token = await get_token(user_id, chat_id, topic_id)
 
     if not token:
         location = "this topic" if topic_id else "this chat"
-        await message.answer(
+        await answer(
+            message,
             f"Not connected to Google Drive for {location}.\n"
-            "Use /connect to link your account first."
+            "Use /connect to link your account first.",
         )
         return
 
-    file_info = get_file_info(message)
-    if not file_info:
+    if token.get("refresh_failed_at"):
+        await answer(
+            message,
+            "Your Google Drive connection has expired.\n"
+            "Please use /disconnect and then /connect to reconnect.",
+        )
         return
 
-    file_id, file_name, mime_type, file_size = file_info
+    files = []
+    for file_message in messages:
+        file_info = get_file_info(file_message)
+        if not file_info:
+            continue
+
+        file_size = file_info[3]
+        if file_size > MAX_FILE_SIZE:
+            await answer(
+                file_message,
+                f"File is too large ({file_size / 1024 / 1024:.1f}MB).\n"
+                "Telegram bots can only download files up to "
+                f"{MAX_FILE_SIZE // 1024 // 1024}MB.",
+            )
+            continue
+
+        files.append(file_info)
 
-    if file_size > MAX_FILE_SIZE:
-        await message.answer(
-            f"File is too large ({file_size / 1024 / 1024:.1f}MB).\n"
-            "Telegram bots can only download files up to 20MB."
-        )
+    if not files:
         return
 
-    status_msg = await message.answer(f"Uploading {file_name} to Google Drive...")
+    if len(files) == 1:
+        text = f"Queued {escape(files[0][1])} for upload to Google Drive..."
+    else:
+        text = f"Queued {len(files)} files for upload to Google Drive..."
+    # Running transfers hold the memory budget; explain the wait up front
+    smallest = min(transfer_memory(info[3], TELEGRAM_LOCAL_MODE) for info in files)
+    if upload_memory.would_wait(smallest):
+        text += "\nThe bot is busy, uploads will start shortly."
+    status_msg = await answer(message, text)
 
     try:
-        token = await ensure_valid_token(token, user_id, chat_id, topic_id)
-    except RefreshError:
-        await status_msg.edit_text(
-            "Your Google Drive connection has expired.\n"
-            "Please use /disconnect and then /connect to reconnect."
+        await enqueue_upload_jobs(
+            user_id, chat_id, topic_id, files, status_msg.message_id
         )
-        return
-    except Exception:
-        logging.exception("Token refresh failed")
-        await status_msg.edit_text(
-            "Failed to refresh Google Drive connection.\n"
-            "Please try again or use /disconnect and /connect to reconnect."
-        )
-        return
-
-    try:
-        file = await bot.get_file(file_id)
-        if not file.file_path:
-            await status_msg.edit_text(
-                "Failed to get file from Telegram. Please try again."
-            )
-            return
-        file_content = BytesIO()
-        await bot.download_file(file.file_path, file_content)
-        file_content.seek(0)
     except Exception:
-        logging.exception("Failed to download file from Telegram")
-        await status_msg.edit_text(
-            "Failed to download file from Telegram. Please try again."
+        logging.exception("Failed to queue upload")
+        edit_message(
+            status_msg.bot,
+            chat_id,
+            status_msg.message_id,
+            "Failed to queue upload. Please try again.",
         )
         return
 
-    try:
-        credentials = create_credentials(token["access_token"], token["refresh_token"])
-        folder_id = token.get("folder_id")
-        drive_link = upload_file(
-            credentials, file_content, file_name, mime_type, folder_id
-        )
-        await status_msg.edit_text(f"Uploaded to Google Drive:\n{drive_link}")
-    except RefreshError:
-        await status_msg.edit_text(
-            "Your Google Drive access has been revoked.\n"
-            "Please use /disconnect and then /connect to reconnect."
-        )
-    except Exception:
-        logging.exception("Failed to upload file to Google Drive")
-        await status_msg.edit_text(
-            "Failed to upload file to Google Drive. Please try again."
-        )
+    notify_workers()
@@ -0,0 +1,59 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+
+from aiogram.types import Message
+
+from config import MEDIA_GROUP_WINDOW
+
+type FlushCallback = Callable[[list[Message]], Awaitable[None]]
+
+_groups: dict[tuple[int, str], list[Message]] = {}
+_timers: dict[tuple[int, str], tuple[asyncio.TimerHandle, FlushCallback]] = {}
+_flushing: set[asyncio.Task] = set()
+
+
+def add_to_media_group(message: Message, flush: FlushCallback) -> None:
+    """Collect album messages and pass them to `flush` together.
+
+    Telegram sends an album as separate messages sharing media_group_id.
+    The group is flushed once no new message arrived for
+    MEDIA_GROUP_WINDOW seconds.
+    """
+    if not message.media_group_id:
+        raise ValueError("Message is not part of a media group")
+    key = (message.chat.id, message.media_group_id)
+    _groups.setdefault(key, []).append(message)
+
+    pending = _timers.get(key)
+    if pending is not None:
+        pending[0].cancel()
+    loop = asyncio.get_running_loop()
+    timer = loop.call_later(MEDIA_GROUP_WINDOW, _start_flush, key, flush)
+    _timers[key] = (timer, flush)
+
+
+def _start_flush(key: tuple[int, str], flush: FlushCallback) -> None:
+    _timers.pop(key, None)
+    messages = sorted(_groups.pop(key, []), key=lambda m: m.message_id)
+    if not messages:
+        return
+    task = asyncio.create_task(_flush(messages, flush))
+    _flushing.add(task)
+    task.add_done_callback(_flushing.discard)
+
+
+async def _flush(messages: list[Message], flush: FlushCallback) -> None:
+    try:
+        await flush(messages)
+    except Exception:
+        logging.exception("Failed to handle media group")
+
+
+async def flush_media_groups() -> None:
+    """Queue every album still being collected and wait for it, on shutdown."""
+    for key, (timer, flush) in list(_timers.items()):
+        timer.cancel()
+        _start_flush(key, flush)
+    if _flushing:
+        await asyncio.gather(*_flushing, return_exceptions=True)
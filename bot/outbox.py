@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import Message
+
+from config import OUTBOX_GLOBAL_RATE, OUTBOX_GROUP_INTERVAL, OUTBOX_PRIVATE_INTERVAL
+from services.rate_limit import TokenBucket
+
+
+@dataclass
+class _Request:
+    bot: Bot
+    method: str  # "send" or "edit"
+    kwargs: dict[str, Any]
+    future: asyncio.Future
+
+
+@dataclass
+class _Chat:
+    queue: deque[_Request] = field(default_factory=deque)
+    # message_id -> edit still waiting in the queue, so newer text replaces it
+    edits: dict[int, _Request] = field(default_factory=dict)
+    ready_at: float = 0.0
+    task: asyncio.Task | None = None
+
+
+_chats: dict[int, _Chat] = {}
+# Telegram allows about 30 messages per second across all chats
+_global = TokenBucket(OUTBOX_GLOBAL_RATE, OUTBOX_GLOBAL_RATE)
+
+
+def share_global_rate(shard_count: int) -> None:
+    """Give this process its part of the bot-wide rate when sharded."""
+    _global.rate = _global.capacity = OUTBOX_GLOBAL_RATE / shard_count
+
+
+def _interval(chat_id: int) -> float:
+    # Groups and channels have negative ids and a stricter limit
+    return OUTBOX_GROUP_INTERVAL if chat_id < 0 else OUTBOX_PRIVATE_INTERVAL
+
+
+def _enqueue(chat_id: int, request: _Request) -> None:
+    chat = _chats.get(chat_id)
+    if chat is None:
+        chat = _chats[chat_id] = _Chat()
+    chat.queue.append(request)
+    if request.method == "edit":
+        chat.edits[request.kwargs["message_id"]] = request
+    if chat.task is None:
+        chat.task = asyncio.create_task(_drain(chat_id, chat))
+
+
+async def _call(request: _Request) -> Any:
+    if request.method == "send":
+        return await request.bot.send_message(**request.kwargs)
+    try:
+        return await request.bot.edit_message_text(**request.kwargs)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
+
+
+async def _drain(chat_id: int, chat: _Chat) -> None:
+    """Send a chat's queued messages one at a time at the allowed pace."""
+    try:
+        while True:
+            # Also wait after the last message, so a message queued right
+            # after this task exits still respects the interval
+            delay = chat.ready_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if not chat.queue:
+                break
+            request = chat.queue[0]
+            if request.method == "edit":
+                # From here on a newer edit must be queued separately
+                message_id = request.kwargs["message_id"]
+                if chat.edits.get(message_id) is request:
+                    del chat.edits[message_id]
+
+            await _global.acquire()
+            try:
+                result = await _call(request)
+            except TelegramRetryAfter as e:
+                logging.warning(
+                    "Flood control in chat %s for %ss", chat_id, e.retry_after
+                )
+                chat.ready_at = time.monotonic() + e.retry_after
+                if request.method == "edit":
+                    chat.edits.setdefault(message_id, request)
+                continue
+            except Exception as e:
+                if request.method == "edit":
+                    logging.warning("Failed to edit message in chat %s: %s", chat_id, e)
+                    result = None
+                elif not request.future.done():
+                    request.future.set_exception(e)
+            if not request.future.done():
+                request.future.set_result(result)
+            chat.queue.popleft()
+            chat.ready_at = time.monotonic() + _interval(chat_id)
+    except asyncio.CancelledError:
+        # Shutting down: don't leave senders waiting forever
+        for request in chat.queue:
+            request.future.cancel()
+        chat.queue.clear()
+        chat.edits.clear()
+        raise
+    finally:
+        chat.task = None
+        if not chat.queue:
+            _chats.pop(chat_id, None)
+
+
+async def send_message(bot: Bot, chat_id: int, text: str, **kwargs: Any) -> Message:
+    """Queue a message to `chat_id` and wait until it has been sent."""
+    future = asyncio.get_running_loop().create_future()
+    _enqueue(
+        chat_id,
+        _Request(bot, "send", {"chat_id": chat_id, "text": text, **kwargs}, future),
+    )
+    return await future
+
+
+async def answer(message: Message, text: str, **kwargs: Any) -> Message:
+    """Like `message.answer`, but queued through the outbox."""
+    if message.is_topic_message:
+        kwargs.setdefault("message_thread_id", message.message_thread_id)
+    return await send_message(message.bot, message.chat.id, text, **kwargs)
+
+
+def edit_message(
+    bot: Bot, chat_id: int, message_id: int, text: str, **kwargs: Any
+) -> asyncio.Future:
+    """Queue an edit of a message without waiting for it.
+
+    While the edit is queued, a newer edit of the same message replaces
+    its text, so fast-changing status messages cost one request. The
+    returned future resolves once the text is shown; errors are logged.
+    """
+    chat = _chats.get(chat_id)
+    pending = chat.edits.get(message_id) if chat else None
+    if pending is not None:
+        pending.kwargs.update(text=text, **kwargs)
+        return pending.future
+    future = asyncio.get_running_loop().create_future()
+    _enqueue(
+        chat_id,
+        _Request(
+            bot,
+            "edit",
+            {"chat_id": chat_id, "message_id": message_id, "text": text, **kwargs},
+            future,
+        ),
+    )
+    return future
+
+
+async def flush_outbox(timeout: float) -> None:
+    """Wait up to `timeout` seconds for queued messages to go out."""
+    tasks = [chat.task for chat in _chats.values() if chat.task]
+    if not tasks:
+        return
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import socket
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+# Entry point of a shard process: (shard, shard_count, connection to front)
+type ShardTarget = Callable[[int, int, socket.socket], None]
+
+# Updates are sent as JSON lines; allow for long messages with many entities
+_MAX_UPDATE_SIZE = 1024 * 1024
+# Fresh interpreters: forking a process with a running event loop and
+# threads is unsafe
+_context = multiprocessing.get_context("spawn")
+
+
+def shard_of(chat_id: int, shard_count: int) -> int:
+    """Shard that owns `chat_id`; claim_upload_job uses the same rule."""
+    return abs(chat_id) % shard_count
+
+
+class _Shard:
+    # Set by start(), which runs before anything else is called
+    process: multiprocessing.process.BaseProcess
+    writer: asyncio.StreamWriter
+
+    def __init__(self, index: int, count: int, target: ShardTarget):
+        self.index = index
+        self.count = count
+        self.target = target
+        self.lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        parent, child = socket.socketpair()
+        self.process = _context.Process(
+            target=self.target,
+            args=(self.index, self.count, child),
+            name=f"bot-shard-{self.index}",
+        )
+        self.process.start()
+        child.close()
+        reader, self.writer = await asyncio.open_unix_connection(sock=parent)
+        # Sent once the shard is connected and handling updates
+        if not await reader.readline():
+            raise RuntimeError(f"Shard {self.index} exited during startup")
+
+    async def ensure_running(self) -> None:
+        """Restart the process if it died. Call with `lock` held."""
+        if self.process.is_alive():
+            return
+        logging.error(
+            "Shard %s exited with code %s, restarting",
+            self.index,
+            self.process.exitcode,
+        )
+        self.writer.close()
+        await self.start()
+
+    async def send(self, line: bytes) -> None:
+        async with self.lock:
+            await self.ensure_running()
+            try:
+                self.writer.write(line)
+                await self.writer.drain()
+            except ConnectionError:
+                # Broken since the check; the update goes to a replacement
+                self.process.kill()
+                await asyncio.to_thread(self.process.join)
+                await self.ensure_running()
+                self.writer.write(line)
+                await self.writer.drain()
+
+    async def stop(self, timeout: float) -> None:
+        async with self.lock:
+            self.writer.close()
+            await asyncio.to_thread(self.process.join, timeout)
+            if self.process.is_alive():
+                logging.warning("Shard %s did not stop in time, killing", self.index)
+                self.process.kill()
+                await asyncio.to_thread(self.process.join)
+
+
+class ShardRouter(BaseMiddleware):
+    """Outer update middleware that passes updates to shard processes.
+
+    Each chat is handled by one shard, so its updates keep their order and
+    in-process state (albums, status messages, outgoing message pacing)
+    stays together. Handlers are not run in this process.
+    """
+
+    def __init__(self, target: ShardTarget, shard_count: int):
+        self._shards = [_Shard(n, shard_count, target) for n in range(shard_count)]
+        self._watcher: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        await asyncio.gather(*(shard.start() for shard in self._shards))
+        self._watcher = asyncio.create_task(self._watch())
+        logging.info("Started %s shard processes", len(self._shards))
+
+    async def stop(self, timeout: float) -> None:
+        """Close the shards' connections and wait for them to drain and exit."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+        await asyncio.gather(*(shard.stop(timeout) for shard in self._shards))
+
+    async def _watch(self) -> None:
+        # Idle shards must come back too: they also run their chats' uploads
+        while True:
+            await asyncio.sleep(1)
+            for shard in self._shards:
+                async with shard.lock:
+                    try:
+                        await shard.ensure_running()
+                    except Exception:
+                        logging.exception("Failed to restart shard %s", shard.index)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+        chat = data.get("event_chat")
+        user = data.get("event_from_user")
+        key = chat.id if chat else user.id if user else event.update_id
+        line = event.model_dump_json(by_alias=True, exclude_unset=True)
+        await self._shards[shard_of(key, len(self._shards))].send(line.encode() + b"\n")
+
+
+async def _feed(dp: Dispatcher, bot: Bot, update: dict) -> None:
+    try:
+        await dp.feed_raw_update(bot, update)
+    except Exception:
+        logging.exception("Failed to handle update %s", update.get("update_id"))
+
+
+async def feed_updates(sock: socket.socket, bot: Bot, dp: Dispatcher) -> None:
+    """Handle updates sent by the front process until it closes `sock`."""
+    reader, writer = await asyncio.open_unix_connection(
+        sock=sock, limit=_MAX_UPDATE_SIZE
+    )
+    writer.write(b"ready\n")
+    await writer.drain()
+    tasks: set[asyncio.Task] = set()
+    try:
+        while line := await reader.readline():
+            # Started in arrival order, like polling with handle_as_tasks
+            task = asyncio.create_task(_feed(dp, bot, json.loads(line)))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    finally:
+        writer.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,370 @@
+import hashlib
+import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import aclosing, asynccontextmanager
+from html import escape
+from io import BytesIO
+
+from aiogram import Bot
+from google.auth.exceptions import RefreshError
+
+from bot.outbox import edit_message
+from config import (
+    DRIVE_MAX_CHUNK_SIZE,
+    STREAM_BUFFER_CHUNKS,
+    STREAM_MAX_CHUNK_SIZE,
+    STREAM_READ_CHUNK_SIZE,
+    STREAM_UPLOAD_CHUNK_SIZE,
+    TELEGRAM_LOCAL_MODE,
+    UPLOAD_PROGRESS_INTERVAL,
+    UPLOAD_STREAMING,
+)
+from db.queries import save_upload_checkpoint
+from services.circuit_breaker import CircuitOpenError
+from services.dedup import find_duplicate, remember_upload
+from services.drive_client import DriveAuthError, DriveError, is_rate_limited
+from services.drive_folders import forget_folder, resolve_folder_path
+from services.google_drive import (
+    CheckpointCallback,
+    ProgressCallback,
+    upload_file,
+    upload_local_file,
+    upload_stream,
+)
+from services.memory_budget import upload_memory
+from services.metrics import UPLOADED_BYTES, stage
+from services.rate_limit import drive_account
+from services.streaming import DownloadError, prefetch, stream_telegram_file
+from services.token_store import get_valid_token
+
+# Telegram limit: 20MB for bots, 2GB through a local Bot API server
+MAX_FILE_SIZE = (2000 if TELEGRAM_LOCAL_MODE else 20) * 1024 * 1024
+
+
+class UploadError(Exception):
+    """Upload failed; `message` is shown to the user."""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.message = message
+        self.retryable = retryable
+
+
+def progress_reporter(bot: Bot, job: dict) -> ProgressCallback | None:
+    """Show upload progress of a single-file job in its status message."""
+    if not job["status_message_id"] or job["batch_size"] > 1:
+        return None
+    last_report = time.monotonic()
+
+    async def report(sent: int, total: int) -> None:
+        nonlocal last_report
+        now = time.monotonic()
+        if sent >= total or now - last_report < UPLOAD_PROGRESS_INTERVAL:
+            return
+        last_report = now
+        edit_message(
+            bot,
+            job["chat_id"],
+            job["status_message_id"],
+            f"Uploading {escape(job['file_name'])}... "
+            f"{sent * 100 // total}% "
+            f"({sent / 1024 / 1024:.0f}/{total / 1024 / 1024:.0f}MB)",
+        )
+
+    return report
+
+
+def checkpointer(job: dict) -> CheckpointCallback:
+    """Persist upload progress so a retried job resumes the Drive session."""
+
+    async def checkpoint(session_uri: str, offset: int) -> None:
+        try:
+            await save_upload_checkpoint(
+                job["id"], job["attempts"], session_uri, offset
+            )
+        except Exception:
+            # Losing a checkpoint only costs a restart from an older offset
+            logging.warning("Failed to save upload checkpoint", exc_info=True)
+
+    return checkpoint
+
+
+def transfer_memory(file_size: int, local: bool) -> int:
+    """Most bytes `transfer_file` holds in memory for a file of `file_size`."""
+    if file_size <= 0:
+        # Telegram didn't say; assume the largest file it lets through
+        file_size = MAX_FILE_SIZE
+    if local:
+        # Two read buffers of up to one Drive chunk
+        return 2 * min(file_size, DRIVE_MAX_CHUNK_SIZE)
+    if UPLOAD_STREAMING:
+        # Prefetched pieces, plus the Drive chunk being filled and its copy
+        prefetched = STREAM_BUFFER_CHUNKS * STREAM_READ_CHUNK_SIZE
+        return min(file_size, prefetched) + 2 * min(file_size, STREAM_MAX_CHUNK_SIZE)
+    # The whole file
+    return file_size
+
+
+@asynccontextmanager
+async def reserve_memory(bot: Bot, job: dict) -> AsyncIterator[None]:
+    """Hold the job's share of UPLOAD_MEMORY_BUDGET for its transfer.
+
+    If the budget is used up by other transfers, the user is told the
+    upload is queued and it starts once enough of them finish.
+    """
+    size = transfer_memory(job["file_size"], bot.session.api.is_local)
+    single = job["status_message_id"] and job["batch_size"] <= 1
+    if single and upload_memory.would_wait(size):
+        edit_message(
+            bot,
+            job["chat_id"],
+            job["status_message_id"],
+            f"The bot is busy, {escape(job['file_name'])} is queued "
+            "and will be uploaded shortly...",
+        )
+    async with stage("memory"):
+        reserved = await upload_memory.acquire(size)
+    try:
+        yield
+    finally:
+        upload_memory.release(reserved)
+
+
+async def transfer_file(
+    bot: Bot,
+    file_path: str,
+    token: dict,
+    job: dict,
+    folder_id: str | None,
+) -> dict:
+    """Copy a Telegram file to Google Drive, returning the Drive file.
+
+    Buffered uploads are hashed first, so content already in the folder
+    under another Telegram file id is not uploaded again. All modes resume
+    the Drive session of a previous attempt of the job.
+    """
+    access_token = token["access_token"]
+    session_uri = job["upload_session_uri"]
+    checkpoint = checkpointer(job)
+    api = bot.session.api
+    if api.is_local:
+        # The server already saved the file; read it straight from disk
+        async with stage("upload"):
+            drive_file = await upload_local_file(
+                access_token,
+                str(api.wrap_local_file.to_local(file_path)),
+                job["file_name"],
+                job["mime_type"],
+                folder_id,
+                session_uri=session_uri,
+                checkpoint=checkpoint,
+                on_progress=progress_reporter(bot, job),
+            )
+        UPLOADED_BYTES.inc(job["file_size"], source="local")
+        return drive_file
+
+    if UPLOAD_STREAMING:
+        source = prefetch(stream_telegram_file(bot, file_path), STREAM_BUFFER_CHUNKS)
+        async with stage("stream"), aclosing(source) as chunks:
+            drive_file = await upload_stream(
+                access_token,
+                chunks,
+                job["file_name"],
+                job["mime_type"],
+                folder_id,
+                chunk_size=STREAM_UPLOAD_CHUNK_SIZE,
+                max_chunk_size=STREAM_MAX_CHUNK_SIZE,
+                session_uri=session_uri,
+                checkpoint=checkpoint,
+            )
+        UPLOADED_BYTES.inc(job["file_size"], source="stream")
+        return drive_file
+
+    file_content = BytesIO()
+    try:
+        async with stage("download"):
+            await bot.download_file(file_path, file_content)
+    except Exception as e:
+        raise DownloadError(f"Failed to download {file_path} from Telegram") from e
+
+    md5_checksum = hashlib.md5(file_content.getbuffer()).hexdigest()
+    duplicate = await find_duplicate(
+        access_token, token.get("email"), folder_id, md5_checksum=md5_checksum
+    )
+    if duplicate:
+        return {**duplicate, "md5Checksum": md5_checksum}
+
+    file_content.seek(0)
+    async with stage("upload"):
+        drive_file = await upload_file(
+            access_token,
+            file_content,
+            job["file_name"],
+            job["mime_type"],
+            folder_id,
+            session_uri=session_uri,
+            checkpoint=checkpoint,
+        )
+    UPLOADED_BYTES.inc(job["file_size"], source="buffered")
+    return drive_file
+
+
+def _unavailable(error: CircuitOpenError) -> UploadError:
+    return UploadError(
+        f"Can't reach {error.description} right now.\n"
+        "Your file is queued and will be uploaded once it's back.",
+        retryable=True,
+    )
+
+
+def _is_retryable(error: DriveError) -> bool:
+    return error.status >= 500 or is_rate_limited(error)
+
+
+async def process_upload(bot: Bot, job: dict) -> dict:
+    """Run one queued upload job and return the Drive file (id, webViewLink).
+
+    Raises UploadError with a user-facing message on failure.
+    """
+    user_id = job["user_id"]
+    chat_id = job["chat_id"]
+    topic_id = job["topic_id"]
+
+    try:
+        async with stage("token"):
+            token = await get_valid_token(user_id, chat_id, topic_id)
+    except RefreshError as e:
+        raise UploadError(
+            "Your Google Drive connection has expired.\n"
+            "Please use /disconnect and then /connect to reconnect."
+        ) from e
+    except CircuitOpenError as e:
+        raise _unavailable(e) from e
+    except Exception as e:
+        raise UploadError(
+            "Failed to refresh Google Drive connection.\n"
+            "Please try again or use /disconnect and /connect to reconnect.",
+            retryable=True,
+        ) from e
+
+    if not token:
+        location = "this topic" if topic_id else "this chat"
+        raise UploadError(
+            f"Not connected to Google Drive for {location}.\n"
+            "Use /connect to link your account first."
+        )
+
+    with drive_account(token.get("email")):
+        return await _copy_to_drive(bot, job, token)
+
+
+async def _copy_to_drive(bot: Bot, job: dict, token: dict) -> dict:
+    """Resolve the target folder, skip duplicates and transfer the file."""
+    account_email = token.get("email")
+    folder_id = token.get("folder_id")
+    try:
+        if token.get("folder_path"):
+            async with stage("folder"):
+                folder_id = await resolve_folder_path(
+                    token["access_token"], account_email, token["folder_path"]
+                )
+        # Reposts of a file already in the folder skip both transfers
+        async with stage("dedup"):
+            duplicate = await find_duplicate(
+                token["access_token"],
+                account_email,
+                folder_id,
+                file_unique_id=job["file_unique_id"],
+            )
+        if duplicate:
+            return duplicate
+    except Exception as e:
+        raise _upload_error(e, token, folder_id) from e
+
+    try:
+        async with stage("get_file"):
+            file = await bot.get_file(job["file_id"])
+    except Exception as e:
+        raise UploadError(
+            "Failed to download file from Telegram. Please try again.",
+            retryable=True,
+        ) from e
+    if not file.file_path:
+        raise UploadError("Failed to get file from Telegram. Please try again.")
+
+    try:
+        async with reserve_memory(bot, job):
+            drive_file = await transfer_file(bot, file.file_path, token, job, folder_id)
+    except Exception as e:
+        if isinstance(e, DriveError) and e.status == 404 and folder_id:
+            # Upload folder was deleted; the retry resolves the path again
+            await forget_folder(account_email, folder_id)
+        raise _upload_error(e, token, folder_id) from e
+
+    try:
+        await remember_upload(
+            account_email, folder_id, job["file_unique_id"], drive_file
+        )
+    except Exception:
+        logging.exception("Failed to record upload for deduplication")
+    return drive_file
+
+
+def _upload_error(error: Exception, token: dict, folder_id: str | None) -> UploadError:
+    """Translate a transfer failure into the message shown to the user."""
+    if isinstance(error, DownloadError):
+        return UploadError(
+            "Failed to download file from Telegram. Please try again.",
+            retryable=True,
+        )
+    if isinstance(error, CircuitOpenError):
+        return _unavailable(error)
+    if isinstance(error, DriveAuthError):
+        return UploadError(
+            "Your Google Drive access has been revoked.\n"
+            "Please use /disconnect and then /connect to reconnect."
+        )
+    if isinstance(error, DriveError):
+        if error.status == 404 and folder_id:
+            return UploadError(
+                "The upload folder no longer exists.\n"
+                "Use /setfolder to choose a new one.",
+                retryable=bool(token.get("folder_path")),
+            )
+        if is_rate_limited(error):
+            return UploadError(
+                "Google Drive is receiving too many uploads from your account.\n"
+                "Your file is queued and will be uploaded shortly.",
+                retryable=True,
+            )
+        return UploadError(
+            "Failed to upload file to Google Drive. Please try again.",
+            retryable=_is_retryable(error),
+        )
+    return UploadError(
+        "Failed to upload file to Google Drive. Please try again.",
+        retryable=True,
+    )
+
+
+def error_class(error: UploadError) -> str:
+    """Short label for the cause of a failed upload, for metrics."""
+    cause = error.__cause__
+    if cause is None:
+        return "upload"
+    if isinstance(cause, CircuitOpenError):
+        return f"{cause.name}_unavailable"
+    if isinstance(cause, RefreshError):
+        return "refresh"
+    if isinstance(cause, DownloadError):
+        return "download"
+    if isinstance(cause, DriveAuthError):
+        return "drive_auth"
+    if isinstance(cause, DriveError):
+        if is_rate_limited(cause):
+            return "drive_rate_limit"
+        return f"drive_{cause.status // 100}xx"
+    if isinstance(cause, TimeoutError):
+        return "timeout"
+    return type(cause).__name__
@@ -0,0 +1,276 @@
+import asyncio
+import html
+import logging
+import random
+import time
+import weakref
+
+from aiogram import Bot
+
+from bot.outbox import edit_message
+from bot.uploads import UploadError, error_class, process_upload
+from config import (
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    JOB_POLL_INTERVAL,
+    JOB_RETRY_BASE_DELAY,
+    JOB_RETRY_MAX_DELAY,
+    UPLOAD_CHAT_CONCURRENCY,
+    UPLOAD_JOB_AGING_RATE,
+    UPLOAD_JOB_MIN_COST,
+    UPLOAD_SMALL_FILE_SIZE,
+    UPLOAD_SMALL_WORKERS,
+    UPLOAD_WORKERS,
+)
+from db.queries import (
+    claim_upload_job,
+    complete_upload_job,
+    extend_upload_job_lease,
+    fail_upload_job,
+    get_upload_batch,
+    release_upload_job,
+    retry_upload_job,
+)
+from services.circuit_breaker import CircuitOpenError
+from services.metrics import ERRORS, IN_FLIGHT, JOB_SECONDS, JOBS
+from services.upload_history import record_upload
+
+_tasks: list[asyncio.Task] = []
+_wakeup = asyncio.Event()
+_stopping = False
+# Serializes edits of a status message shared by an album's jobs
+_status_locks: weakref.WeakValueDictionary[tuple[int, int], asyncio.Lock] = (
+    weakref.WeakValueDictionary()
+)
+
+
+def notify_workers() -> None:
+    """Wake idle workers in this process after a job was enqueued."""
+    _wakeup.set()
+
+
+def start_workers(bot: Bot, shard: int = 0, shard_count: int = 1) -> None:
+    """Start the upload worker pool.
+
+    Workers only claim jobs of chats in `shard` (see bot.sharding). The
+    first UPLOAD_SMALL_WORKERS form a lane for small files.
+    """
+    global _stopping
+    _stopping = False
+    for n in range(UPLOAD_WORKERS):
+        max_file_size = UPLOAD_SMALL_FILE_SIZE if n < UPLOAD_SMALL_WORKERS else None
+        _tasks.append(
+            asyncio.create_task(
+                _worker(bot, shard, shard_count, max_file_size),
+                name=f"upload-worker-{n}",
+            )
+        )
+
+
+async def stop_workers(drain_timeout: float = 0) -> None:
+    """Stop claiming jobs and let running ones finish for `drain_timeout` seconds.
+
+    Jobs still running after that are cancelled and go back to the queue.
+    """
+    global _stopping
+    _stopping = True
+    _wakeup.set()
+    if _tasks and drain_timeout > 0:
+        _, pending = await asyncio.wait(_tasks, timeout=drain_timeout)
+        if pending:
+            logging.warning("Requeueing %s unfinished upload jobs", len(pending))
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+
+
+def _retry_delay(attempts: int) -> float:
+    delay = min(JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1), JOB_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _edit_status(bot: Bot, job: dict, text: str) -> None:
+    # Queued, not awaited: workers never wait on Telegram's rate limits
+    edit_message(bot, job["chat_id"], job["status_message_id"], text)
+
+
+def _batch_status(jobs: list[dict]) -> str:
+    done = sum(job["status"] == "done" for job in jobs)
+    finished = sum(job["status"] in ("done", "failed") for job in jobs)
+    if finished < len(jobs):
+        lines = [f"Uploading {len(jobs)} files to Google Drive... {done} done"]
+    else:
+        lines = [f"Uploaded {done} of {len(jobs)} files to Google Drive:"]
+    for job in jobs:
+        name = html.escape(job["file_name"])
+        if job["status"] == "done":
+            lines.append(f"{name}: {job['result_link']}")
+        elif job["status"] == "failed":
+            lines.append(f"{name}: failed")
+    return "\n".join(lines)
+
+
+async def _report(bot: Bot, job: dict, text: str) -> None:
+    """Show a job's outcome on its status message.
+
+    Jobs from one album share a message that summarizes the whole batch.
+    """
+    if job["status_message_id"] is None:
+        return
+    if job["batch_size"] <= 1:
+        _edit_status(bot, job, text)
+        return
+
+    key = (job["chat_id"], job["status_message_id"])
+    lock = _status_locks.get(key)
+    if lock is None:
+        lock = _status_locks[key] = asyncio.Lock()
+    async with lock:
+        jobs = await get_upload_batch(*key)
+        _edit_status(bot, job, _batch_status(jobs))
+
+
+async def _heartbeat(job: dict, upload: asyncio.Task) -> None:
+    """Keep extending the job's lease, and cancel `upload` once it is lost.
+
+    A failed extension is retried while the lease lasts, so a database
+    hiccup doesn't let another worker claim the job and upload it twice.
+    """
+    interval = JOB_LEASE_SECONDS / 3
+    renewed = time.monotonic()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if not await extend_upload_job_lease(
+                job["id"], job["attempts"], JOB_LEASE_SECONDS
+            ):
+                break  # Reclaimed by another worker
+            renewed = time.monotonic()
+        except Exception as e:
+            logging.warning("Failed to extend lease of upload job %s: %r", job["id"], e)
+            if time.monotonic() + interval >= renewed + JOB_LEASE_SECONDS:
+                break
+    logging.warning("Lost the lease of upload job %s, stopping it", job["id"])
+    upload.cancel()
+
+
+async def _run_job(bot: Bot, job: dict) -> None:
+    upload = asyncio.create_task(process_upload(bot, job))
+    heartbeat = asyncio.create_task(_heartbeat(job, upload))
+    started = time.perf_counter()
+    result = "released"
+    # Whether this worker still held the job when it finished it
+    owned = True
+    IN_FLIGHT.inc()
+    try:
+        drive_file = await upload
+    except asyncio.CancelledError:
+        if asyncio.current_task().cancelling():
+            await asyncio.shield(release_upload_job(job["id"], job["attempts"]))
+            raise
+        owned = False  # Cancelled by the heartbeat
+    except Exception as e:
+        if isinstance(e, UploadError):
+            error = e
+        else:
+            logging.exception("Unexpected error in upload job %s", job["id"])
+            error = UploadError(
+                "Failed to upload file to Google Drive. Please try again.",
+                retryable=True,
+            )
+            error.__cause__ = e
+        reason = repr(error.__cause__ or error)
+        logging.warning(
+            "Upload job %s failed (attempt %s): %s", job["id"], job["attempts"], reason
+        )
+        ERRORS.inc(error=error_class(error))
+        if isinstance(error.__cause__, CircuitOpenError):
+            # Not the job's fault: hand the attempt back and try again when
+            # the breaker lets the next probe through
+            result = "retry"
+            delay = max(error.__cause__.retry_in, 1)
+            owned = await release_upload_job(job["id"], job["attempts"], delay, reason)
+            if owned:
+                await _report(bot, job, error.message)
+        elif error.retryable and job["attempts"] < JOB_MAX_ATTEMPTS:
+            result = "retry"
+            delay = _retry_delay(job["attempts"])
+            owned = await retry_upload_job(job["id"], job["attempts"], delay, reason)
+            if owned:
+                await _report(
+                    bot,
+                    job,
+                    f"Upload of {html.escape(job['file_name'])} failed, retrying "
+                    f"(attempt {job['attempts'] + 1} of {JOB_MAX_ATTEMPTS})...",
+                )
+        else:
+            result = "failed"
+            owned = await fail_upload_job(job["id"], job["attempts"], reason)
+            if owned:
+                record_upload(job, result, time.perf_counter() - started, error=reason)
+                await _report(bot, job, error.message)
+    else:
+        result = "done"
+        drive_link = drive_file["webViewLink"]
+        owned = await complete_upload_job(job["id"], job["attempts"], drive_link)
+        if owned:
+            record_upload(job, result, time.perf_counter() - started, drive_file)
+            await _report(bot, job, f"Uploaded to Google Drive:\n{drive_link}")
+    finally:
+        heartbeat.cancel()
+        upload.cancel()
+        if not owned:
+            # Another worker claimed the job after its lease ran out and
+            # reports the outcome
+            logging.warning(
+                "Upload job %s was reclaimed, dropping its result", job["id"]
+            )
+            result = "lost"
+        # The chat may have been at UPLOAD_CHAT_CONCURRENCY with more queued
+        _wakeup.set()
+        IN_FLIGHT.dec()
+        JOBS.inc(result=result)
+        JOB_SECONDS.observe(time.perf_counter() - started, result=result)
+
+
+async def _worker(
+    bot: Bot, shard: int, shard_count: int, max_file_size: int | None
+) -> None:
+    while not _stopping:
+        try:
+            job = await claim_upload_job(
+                JOB_LEASE_SECONDS,
+                shard,
+                shard_count,
+                max_file_size=max_file_size,
+                chat_concurrency=UPLOAD_CHAT_CONCURRENCY,
+                min_job_cost=UPLOAD_JOB_MIN_COST,
+                aging_rate=UPLOAD_JOB_AGING_RATE,
+            )
+        except CircuitOpenError:
+            # Postgres is down; try again after the poll interval
+            job = None
+        except Exception:
+            logging.exception("Failed to claim upload job")
+            job = None
+
+        if job is None:
+            if _stopping:
+                break
+            try:
+                await asyncio.wait_for(_wakeup.wait(), JOB_POLL_INTERVAL)
+            except TimeoutError:
+                pass
+            _wakeup.clear()
+            continue
+
+        # Only each flow's oldest job is offered, so idle workers that raced
+        # for this one may find the next job now
+        _wakeup.set()
+        try:
+            await _run_job(bot, job)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception("Upload job %s crashed", job["id"])
@@ -6,8 +6,156 @@ GOOGLE_CLIENT_ID = getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = getenv("GOOGLE_CLIENT_SECRET")
 GOOGLE_REDIRECT_URI = "http://localhost"
 
+# Unused /connect requests expire after this many seconds and are purged
+OAUTH_STATE_TTL = float(getenv("OAUTH_STATE_TTL", "3600"))
+OAUTH_STATE_PURGE_INTERVAL = float(getenv("OAUTH_STATE_PURGE_INTERVAL", "600"))
+OAUTH_STATE_PURGE_BATCH_SIZE = int(getenv("OAUTH_STATE_PURGE_BATCH_SIZE", "1000"))
+
+# asyncpg pool; each connection caches up to DB_STATEMENT_CACHE_SIZE prepared
+# statements (set 0 behind PgBouncer in transaction mode)
+DB_POOL_MIN_SIZE = int(getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(getenv("DB_POOL_MAX_SIZE", "20"))
+DB_STATEMENT_CACHE_SIZE = int(getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+DB_COMMAND_TIMEOUT = float(getenv("DB_COMMAND_TIMEOUT", "30"))
+# Idle connections above DB_POOL_MIN_SIZE are closed after this many seconds
+DB_MAX_INACTIVE_LIFETIME = float(getenv("DB_MAX_INACTIVE_LIFETIME", "300"))
+# Longest wait for a free connection before a query fails
+DB_ACQUIRE_TIMEOUT = float(getenv("DB_ACQUIRE_TIMEOUT", "10"))
+
+# Circuit breakers (Drive, token refresh, Postgres): after this many
+# consecutive failures calls fail immediately for BREAKER_RESET_TIMEOUT
+# seconds, then a single probe call decides whether to close again
+BREAKER_FAILURE_THRESHOLD = int(getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(getenv("BREAKER_RESET_TIMEOUT", "30"))
+
 GOOGLE_SCOPES = [
     "openid",
     "https://www.googleapis.com/auth/drive",
     "https://www.googleapis.com/auth/userinfo.email",
 ]
+
+# Thread pool for blocking Google client calls (oauthlib and requests are
+# synchronous)
+GOOGLE_EXECUTOR_WORKERS = int(getenv("GOOGLE_EXECUTOR_WORKERS", "16"))
+GOOGLE_CALL_TIMEOUT = float(getenv("GOOGLE_CALL_TIMEOUT", "30"))
+
+# Drive v3 REST client (base URLs can point at a local fake server)
+DRIVE_API_URL = getenv("DRIVE_API_URL", "https://www.googleapis.com/drive/v3")
+DRIVE_UPLOAD_URL = getenv(
+    "DRIVE_UPLOAD_URL", "https://www.googleapis.com/upload/drive/v3"
+)
+GOOGLE_USERINFO_URL = getenv(
+    "GOOGLE_USERINFO_URL", "https://www.googleapis.com/oauth2/v2/userinfo"
+)
+DRIVE_POOL_SIZE = int(getenv("DRIVE_POOL_SIZE", "100"))
+DRIVE_REQUEST_TIMEOUT = float(getenv("DRIVE_REQUEST_TIMEOUT", "60"))
+# Resumable upload chunk size, must be a multiple of 256KB
+DRIVE_CHUNK_SIZE = int(getenv("DRIVE_CHUNK_SIZE", str(8 * 1024 * 1024)))
+# Chunk size adapts to measured throughput so each chunk takes about
+# DRIVE_CHUNK_TARGET_SECONDS, within these bounds
+DRIVE_MIN_CHUNK_SIZE = int(getenv("DRIVE_MIN_CHUNK_SIZE", str(256 * 1024)))
+DRIVE_MAX_CHUNK_SIZE = int(getenv("DRIVE_MAX_CHUNK_SIZE", str(32 * 1024 * 1024)))
+DRIVE_CHUNK_TARGET_SECONDS = float(getenv("DRIVE_CHUNK_TARGET_SECONDS", "4"))
+# Times a chunk is resent after a network error before the job is retried
+DRIVE_CHUNK_RETRIES = int(getenv("DRIVE_CHUNK_RETRIES", "3"))
+# Per Google account request budget, shared by all its chats and topics
+DRIVE_ACCOUNT_RATE = float(getenv("DRIVE_ACCOUNT_RATE", "10"))  # requests/s
+DRIVE_ACCOUNT_BURST = float(getenv("DRIVE_ACCOUNT_BURST", "20"))
+# Backoff on 429/403 rate limit responses: base * 2^attempt, capped, jittered
+DRIVE_RATE_LIMIT_RETRIES = int(getenv("DRIVE_RATE_LIMIT_RETRIES", "5"))
+DRIVE_BACKOFF_BASE = float(getenv("DRIVE_BACKOFF_BASE", "1"))
+DRIVE_BACKOFF_MAX = float(getenv("DRIVE_BACKOFF_MAX", "64"))
+
+# Stream Telegram downloads straight into Drive resumable sessions instead of
+# buffering whole files in memory
+UPLOAD_STREAMING = getenv("UPLOAD_STREAMING", "1") == "1"
+STREAM_READ_CHUNK_SIZE = int(getenv("STREAM_READ_CHUNK_SIZE", str(256 * 1024)))
+STREAM_BUFFER_CHUNKS = int(getenv("STREAM_BUFFER_CHUNKS", "8"))
+# Drive chunk size while streaming, must be a multiple of 256KB. Chunks grow
+# on fast links up to STREAM_MAX_CHUNK_SIZE, which bounds memory per upload
+STREAM_UPLOAD_CHUNK_SIZE = int(getenv("STREAM_UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+STREAM_MAX_CHUNK_SIZE = int(getenv("STREAM_MAX_CHUNK_SIZE", str(4 * 1024 * 1024)))
+TELEGRAM_DOWNLOAD_TIMEOUT = int(getenv("TELEGRAM_DOWNLOAD_TIMEOUT", "300"))
+
+# Upload job queue
+UPLOAD_WORKERS = int(getenv("UPLOAD_WORKERS", "8"))
+JOB_MAX_ATTEMPTS = int(getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_LEASE_SECONDS = int(getenv("JOB_LEASE_SECONDS", "120"))
+JOB_POLL_INTERVAL = float(getenv("JOB_POLL_INTERVAL", "2"))
+JOB_RETRY_BASE_DELAY = float(getenv("JOB_RETRY_BASE_DELAY", "5"))
+JOB_RETRY_MAX_DELAY = float(getenv("JOB_RETRY_MAX_DELAY", "600"))
+# Fair scheduling: chats take turns by queued bytes, each job counting at
+# least UPLOAD_JOB_MIN_COST, and run at most UPLOAD_CHAT_CONCURRENCY jobs at
+# once. UPLOAD_SMALL_WORKERS of the UPLOAD_WORKERS only take files up to
+# UPLOAD_SMALL_FILE_SIZE, so small files don't wait behind bulk transfers
+UPLOAD_CHAT_CONCURRENCY = int(getenv("UPLOAD_CHAT_CONCURRENCY", "3"))
+UPLOAD_SMALL_WORKERS = int(getenv("UPLOAD_SMALL_WORKERS", "2"))
+UPLOAD_SMALL_FILE_SIZE = int(getenv("UPLOAD_SMALL_FILE_SIZE", str(2 * 1024 * 1024)))
+UPLOAD_JOB_MIN_COST = int(getenv("UPLOAD_JOB_MIN_COST", str(256 * 1024)))
+# Waiting jobs move up the order as if their flow were served at this many
+# bytes per second, so large files queued behind small ones still get a turn
+UPLOAD_JOB_AGING_RATE = float(getenv("UPLOAD_JOB_AGING_RATE", str(1024 * 1024)))
+# Most bytes all transfers of a process may hold in memory at once
+# (download buffers, Drive chunks); uploads past it wait for a turn
+UPLOAD_MEMORY_BUDGET = int(getenv("UPLOAD_MEMORY_BUDGET", str(256 * 1024 * 1024)))
+
+# Upload history (/history, /stats) is written in batches of up to
+# HISTORY_BATCH_SIZE rows every HISTORY_FLUSH_INTERVAL seconds. While the
+# database is unreachable at most HISTORY_MAX_PENDING rows are kept
+HISTORY_BATCH_SIZE = int(getenv("HISTORY_BATCH_SIZE", "500"))
+HISTORY_FLUSH_INTERVAL = float(getenv("HISTORY_FLUSH_INTERVAL", "2"))
+HISTORY_MAX_PENDING = int(getenv("HISTORY_MAX_PENDING", "50000"))
+HISTORY_PAGE_SIZE = int(getenv("HISTORY_PAGE_SIZE", "10"))
+# /stats also shows totals for this many recent days
+STATS_RECENT_DAYS = int(getenv("STATS_RECENT_DAYS", "7"))
+
+# In-memory OAuth token cache
+TOKEN_CACHE_SIZE = int(getenv("TOKEN_CACHE_SIZE", "10000"))
+# Upper bound on how long another replica's /disconnect can go unnoticed
+TOKEN_CACHE_TTL = float(getenv("TOKEN_CACHE_TTL", "300"))
+
+# Background refresh of access tokens before they expire
+TOKEN_REFRESH_INTERVAL = float(getenv("TOKEN_REFRESH_INTERVAL", "60"))
+TOKEN_REFRESH_LEAD = float(getenv("TOKEN_REFRESH_LEAD", "900"))
+TOKEN_REFRESH_BATCH_SIZE = int(getenv("TOKEN_REFRESH_BATCH_SIZE", "200"))
+TOKEN_REFRESH_CONCURRENCY = int(getenv("TOKEN_REFRESH_CONCURRENCY", "8"))
+
+# How long to wait for the rest of an album before queueing it
+MEDIA_GROUP_WINDOW = float(getenv("MEDIA_GROUP_WINDOW", "1.0"))
+
+# Cached Drive folders are re-checked (trashed/deleted) after this many seconds
+FOLDER_CACHE_REVALIDATE = float(getenv("FOLDER_CACHE_REVALIDATE", "3600"))
+
+# Update delivery: "polling" or "webhook"
+BOT_MODE = getenv("BOT_MODE", "polling")
+WEBHOOK_URL = getenv("WEBHOOK_URL")  # public base URL, e.g. https://bot.example.com
+WEBHOOK_PATH = getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_MAX_CONNECTIONS = int(getenv("WEBHOOK_MAX_CONNECTIONS", "100"))
+# Seconds to let running uploads finish on shutdown before requeueing them
+SHUTDOWN_DRAIN_TIMEOUT = float(getenv("SHUTDOWN_DRAIN_TIMEOUT", "30"))
+# Processes handling updates and uploads. Above 1, the main process only
+# receives updates and routes each chat to one of them by chat id
+BOT_PROCESSES = int(getenv("BOT_PROCESSES", "1"))
+
+# Self-hosted Bot API server (https://github.com/tdlib/telegram-bot-api)
+TELEGRAM_API_URL = getenv("TELEGRAM_API_URL")  # e.g. http://telegram-bot-api:8081
+# Server runs with --local: 2GB files, downloads are paths on its disk
+TELEGRAM_LOCAL_MODE = getenv("TELEGRAM_LOCAL_MODE", "0") == "1"
+# Where the server's --dir is mounted in this container, if the paths differ
+TELEGRAM_SERVER_FILES_DIR = getenv("TELEGRAM_SERVER_FILES_DIR")
+TELEGRAM_LOCAL_FILES_DIR = getenv("TELEGRAM_LOCAL_FILES_DIR")
+# Minimum seconds between upload progress edits of the status message
+UPLOAD_PROGRESS_INTERVAL = float(getenv("UPLOAD_PROGRESS_INTERVAL", "5"))
+
+# Prometheus metrics endpoint (/metrics); set METRICS_PORT=0 to disable
+METRICS_HOST = getenv("METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(getenv("METRICS_PORT", "9090"))
+
+# Outgoing Telegram messages: minimum seconds between messages/edits in one
+# chat (groups allow about 20 per minute) and the global rate per second
+OUTBOX_GROUP_INTERVAL = float(getenv("OUTBOX_GROUP_INTERVAL", "3"))
+OUTBOX_PRIVATE_INTERVAL = float(getenv("OUTBOX_PRIVATE_INTERVAL", "1"))
+OUTBOX_GLOBAL_RATE = float(getenv("OUTBOX_GLOBAL_RATE", "25"))
@@ -1,25 +1,157 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
 import asyncpg
 
-from config import DATABASE_URL
+from config import (
+    DATABASE_URL,
+    DB_ACQUIRE_TIMEOUT,
+    DB_COMMAND_TIMEOUT,
+    DB_MAX_INACTIVE_LIFETIME,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MIN_SIZE,
+    DB_STATEMENT_CACHE_SIZE,
+)
+from services.circuit_breaker import CircuitBreaker
+from services.metrics import (
+    DB_POOL_CONNECTIONS,
+    register_collector,
+    register_health_check,
+)
+
+
+def is_outage(error: Exception) -> bool:
+    # Lost or refused connections, timeouts and server shutdowns; query
+    # errors such as constraint violations mean the database is fine
+    return isinstance(
+        error,
+        (
+            OSError,
+            TimeoutError,
+            asyncpg.PostgresConnectionError,
+            asyncpg.InsufficientResourcesError,
+            asyncpg.OperatorInterventionError,
+        ),
+    )
+
+
+_breaker = CircuitBreaker("postgres", "the database", is_outage, critical=True)
+
+
+class GuardedPool:
+    """The asyncpg pool behind the Postgres circuit breaker.
+
+    Has the query methods of asyncpg.Pool. Waiting for a free connection
+    is bounded by DB_ACQUIRE_TIMEOUT, and while the circuit is open
+    queries raise CircuitOpenError at once.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+        # Queries waiting for a free connection
+        self.waiting = 0
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[asyncpg.Connection]:
+        async with _breaker.guard():
+            if self.pool.get_idle_size():
+                # A connected idle connection is handed out without waiting;
+                # the timeout would only add a wait_for task per query
+                connection = await self.pool.acquire()
+            else:
+                self.waiting += 1
+                try:
+                    connection = await self.pool.acquire(timeout=DB_ACQUIRE_TIMEOUT)
+                finally:
+                    self.waiting -= 1
+            try:
+                yield connection
+            finally:
+                await self.pool.release(connection)
+
+    async def execute(self, query: str, *args: Any) -> str:
+        async with self.acquire() as connection:
+            return await connection.execute(query, *args)
+
+    async def fetch(self, query: str, *args: Any) -> list[asyncpg.Record]:
+        async with self.acquire() as connection:
+            return await connection.fetch(query, *args)
+
+    async def fetchrow(self, query: str, *args: Any) -> asyncpg.Record | None:
+        async with self.acquire() as connection:
+            return await connection.fetchrow(query, *args)
 
-_pool: asyncpg.Pool | None = None
+    async def fetchval(self, query: str, *args: Any) -> Any:
+        async with self.acquire() as connection:
+            return await connection.fetchval(query, *args)
 
 
-async def init_pool() -> asyncpg.Pool:
+_pool: GuardedPool | None = None
+
+
+async def init_pool(
+    min_size: int = DB_POOL_MIN_SIZE,
+    max_size: int = DB_POOL_MAX_SIZE,
+    statement_cache_size: int = DB_STATEMENT_CACHE_SIZE,
+) -> GuardedPool:
+    """Create the connection pool.
+
+    Queries are constant strings, so asyncpg's per-connection statement
+    cache prepares each one once and reuses it on later calls.
+    """
     global _pool
     if _pool is None:
-        _pool = await asyncpg.create_pool(DATABASE_URL)
+        pool = await asyncpg.create_pool(
+            DATABASE_URL,
+            min_size=min_size,
+            max_size=max_size,
+            statement_cache_size=statement_cache_size,
+            command_timeout=DB_COMMAND_TIMEOUT,
+            max_inactive_connection_lifetime=DB_MAX_INACTIVE_LIFETIME,
+        )
+        _pool = GuardedPool(pool)
     return _pool
 
 
 async def close_pool() -> None:
     global _pool
     if _pool is not None:
-        await _pool.close()
+        await _pool.pool.close()
         _pool = None
 
 
-def get_pool() -> asyncpg.Pool:
+def get_pool() -> GuardedPool:
     if _pool is None:
         raise RuntimeError("Database pool not initialized. Call init_pool() first.")
     return _pool
+
+
+def _pool_usage(guarded: GuardedPool) -> dict[str, int]:
+    pool = guarded.pool
+    return {
+        "size": pool.get_size(),
+        "max_size": pool.get_max_size(),
+        "in_use": pool.get_size() - pool.get_idle_size(),
+        "waiting": guarded.waiting,
+    }
+
+
+def _health() -> tuple[bool, dict]:
+    if _pool is None:
+        return True, {}
+    usage = _pool_usage(_pool)
+    # Saturated: every connection is busy and queries are queueing for one
+    saturated = usage["in_use"] >= usage["max_size"] and usage["waiting"] > 0
+    return not saturated, {**usage, "saturated": saturated}
+
+
+def _collect_metrics() -> None:
+    if _pool is None:
+        return
+    for state, value in _pool_usage(_pool).items():
+        DB_POOL_CONNECTIONS.set(value, state=state)
+
+
+register_collector(_collect_metrics)
+register_health_check("db_pool", _health)
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 from db.connection import get_pool
 
@@ -38,6 +38,45 @@ async def get_oauth_state(state: str) -> dict | None:
     return None
 
 
+async def get_pending_oauth_state(
+    user_id: int, chat_id: int, topic_id: int | None, max_age_seconds: float
+) -> str | None:
+    """Latest /connect request of a user+chat+topic that is still pending."""
+    pool = get_pool()
+    return await pool.fetchval(
+        """
+        SELECT state FROM oauth_states
+        WHERE user_id = $1 AND chat_id = $2 AND topic_id IS NOT DISTINCT FROM $3
+          AND created_at > NOW() - make_interval(secs => $4)
+        ORDER BY created_at DESC
+        LIMIT 1
+        """,
+        user_id,
+        chat_id,
+        topic_id,
+        max_age_seconds,
+    )
+
+
+async def purge_oauth_states(older_than_seconds: float, limit: int) -> int:
+    """Delete up to `limit` abandoned /connect states. Returns the count."""
+    pool = get_pool()
+    result = await pool.execute(
+        """
+        DELETE FROM oauth_states
+        WHERE state IN (
+            SELECT state FROM oauth_states
+            WHERE created_at < NOW() - make_interval(secs => $1)
+            LIMIT $2
+            FOR UPDATE SKIP LOCKED
+        )
+        """,
+        older_than_seconds,
+        limit,
+    )
+    return int(result.split()[-1])
+
+
 async def delete_oauth_state(state: str) -> None:
     """Clean up OAuth state after use."""
     pool = get_pool()
@@ -51,21 +90,30 @@ async def save_oauth_token(
     tokens: dict,
     email: str | None,
 ) -> None:
-    """Store OAuth credentials for a user+chat+topic combination."""
-    pool = get_pool()
-    expires_at = tokens.get("expires_at")
-    if isinstance(expires_at, datetime):
-        expires_at = expires_at
+    """Store OAuth credentials for a user+chat+topic combination.
 
+    The credentials are saved on the Google account, which other chats and
+    topics connected with the same email share.
+    """
+    pool = get_pool()
     await pool.execute(
         """
-        INSERT INTO oauth_tokens (user_id, chat_id, topic_id, email, access_token, refresh_token, expires_at)
-        VALUES ($1, $2, $3, $4, $5, $6, $7)
+        WITH account AS (
+            INSERT INTO google_accounts (email, access_token, refresh_token, expires_at)
+            VALUES ($4, $5, $6, $7)
+            ON CONFLICT (email) DO UPDATE SET
+                access_token = EXCLUDED.access_token,
+                refresh_token = EXCLUDED.refresh_token,
+                expires_at = EXCLUDED.expires_at,
+                refresh_failed_at = NULL,
+                refresh_error = NULL,
+                updated_at = NOW()
+            RETURNING id
+        )
+        INSERT INTO oauth_bindings (user_id, chat_id, topic_id, account_id)
+        SELECT $1::bigint, $2::bigint, $3::bigint, id FROM account
         ON CONFLICT (user_id, chat_id, topic_id) DO UPDATE SET
-            email = $4,
-            access_token = $5,
-            refresh_token = $6,
-            expires_at = $7,
+            account_id = EXCLUDED.account_id,
             updated_at = NOW()
         """,
         user_id,
@@ -74,10 +122,62 @@ async def save_oauth_token(
         email,
         tokens["access_token"],
         tokens["refresh_token"],
-        expires_at,
+        tokens.get("expires_at"),
     )
 
 
+async def complete_oauth_connection(
+    user_id: int,
+    chat_id: int,
+    topic_id: int | None,
+    tokens: dict,
+    email: str | None,
+) -> bool:
+    """Consume the pending OAuth states and store the credentials.
+
+    One round trip instead of save + delete. Returns False (and stores
+    nothing) if no state was pending, e.g. a code pasted twice.
+    """
+    pool = get_pool()
+    saved = await pool.fetchval(
+        """
+        WITH consumed AS (
+            DELETE FROM oauth_states
+            WHERE user_id = $1 AND chat_id = $2
+              AND topic_id IS NOT DISTINCT FROM $3
+            RETURNING state
+        ),
+        account AS (
+            INSERT INTO google_accounts (email, access_token, refresh_token, expires_at)
+            SELECT $4::text, $5::text, $6::text, $7::timestamptz
+            WHERE EXISTS (SELECT 1 FROM consumed)
+            ON CONFLICT (email) DO UPDATE SET
+                access_token = EXCLUDED.access_token,
+                refresh_token = EXCLUDED.refresh_token,
+                expires_at = EXCLUDED.expires_at,
+                refresh_failed_at = NULL,
+                refresh_error = NULL,
+                updated_at = NOW()
+            RETURNING id
+        )
+        INSERT INTO oauth_bindings (user_id, chat_id, topic_id, account_id)
+        SELECT $1::bigint, $2::bigint, $3::bigint, id FROM account
+        ON CONFLICT (user_id, chat_id, topic_id) DO UPDATE SET
+            account_id = EXCLUDED.account_id,
+            updated_at = NOW()
+        RETURNING TRUE
+        """,
+        user_id,
+        chat_id,
+        topic_id,
+        email,
+        tokens["access_token"],
+        tokens["refresh_token"],
+        tokens.get("expires_at"),
+    )
+    return bool(saved)
+
+
 async def get_oauth_token(
     user_id: int, chat_id: int, topic_id: int | None
 ) -> dict | None:
@@ -85,79 +185,691 @@ async def get_oauth_token(
     pool = get_pool()
     row = await pool.fetchrow(
         """
-        SELECT email, access_token, refresh_token, expires_at, folder_id
-        FROM oauth_tokens
-        WHERE user_id = $1 AND chat_id = $2 AND topic_id IS NOT DISTINCT FROM $3
+        SELECT b.account_id, a.email, a.access_token, a.refresh_token,
+               a.expires_at, b.folder_id, b.folder_path, a.refresh_failed_at,
+               a.refresh_error
+        FROM oauth_bindings b
+        JOIN google_accounts a ON a.id = b.account_id
+        WHERE b.user_id = $1 AND b.chat_id = $2
+          AND b.topic_id IS NOT DISTINCT FROM $3
         """,
         user_id,
         chat_id,
         topic_id,
     )
-    if row:
-        return {
-            "email": row["email"],
-            "access_token": row["access_token"],
-            "refresh_token": row["refresh_token"],
-            "expires_at": row["expires_at"],
-            "folder_id": row["folder_id"],
-        }
-    return None
+    return dict(row) if row else None
 
 
 async def delete_oauth_token(user_id: int, chat_id: int, topic_id: int | None) -> bool:
-    """Remove OAuth credentials. Returns True if a token was deleted."""
+    """Disconnect a user+chat+topic combination. Returns True if it was connected.
+
+    The Google account is deleted with its last connection.
+    """
     pool = get_pool()
-    result = await pool.execute(
+    deleted = await pool.fetchval(
         """
-        DELETE FROM oauth_tokens
-        WHERE user_id = $1 AND chat_id = $2 AND topic_id IS NOT DISTINCT FROM $3
+        WITH binding AS (
+            DELETE FROM oauth_bindings
+            WHERE user_id = $1 AND chat_id = $2
+              AND topic_id IS NOT DISTINCT FROM $3
+            RETURNING id, account_id
+        ),
+        orphan AS (
+            DELETE FROM google_accounts a
+            USING binding b
+            WHERE a.id = b.account_id
+              AND NOT EXISTS (
+                  SELECT 1 FROM oauth_bindings o
+                  WHERE o.account_id = a.id AND o.id <> b.id
+              )
+        )
+        SELECT count(*) FROM binding
         """,
         user_id,
         chat_id,
         topic_id,
     )
-    return result == "DELETE 1"
+    return deleted > 0
 
 
-async def update_oauth_token(
-    user_id: int,
-    chat_id: int,
-    topic_id: int | None,
-    access_token: str,
-    expires_at: datetime,
+async def get_google_account(account_id: int) -> dict | None:
+    """Current credentials of a Google account."""
+    pool = get_pool()
+    row = await pool.fetchrow(
+        """
+        SELECT id AS account_id, email, access_token, refresh_token, expires_at,
+               refresh_failed_at, refresh_error
+        FROM google_accounts
+        WHERE id = $1
+        """,
+        account_id,
+    )
+    return dict(row) if row else None
+
+
+async def update_google_account_token(
+    account_id: int, access_token: str, expires_at: datetime
 ) -> None:
     """Update access token and expiry after refresh."""
     pool = get_pool()
     await pool.execute(
         """
-        UPDATE oauth_tokens
-        SET access_token = $4, expires_at = $5, updated_at = NOW()
-        WHERE user_id = $1 AND chat_id = $2 AND topic_id IS NOT DISTINCT FROM $3
+        UPDATE google_accounts
+        SET access_token = $2, expires_at = $3, updated_at = NOW()
+        WHERE id = $1
         """,
-        user_id,
-        chat_id,
-        topic_id,
+        account_id,
         access_token,
         expires_at,
     )
 
 
+async def get_expiring_google_accounts(within_seconds: float, limit: int) -> list[dict]:
+    """Connected accounts whose token expires within the window and can
+    still be refreshed."""
+    pool = get_pool()
+    rows = await pool.fetch(
+        """
+        SELECT id AS account_id, email, access_token, refresh_token, expires_at,
+               refresh_failed_at, refresh_error
+        FROM google_accounts a
+        WHERE refresh_failed_at IS NULL
+          AND (expires_at IS NULL
+               OR expires_at < NOW() + make_interval(secs => $1))
+          AND EXISTS (SELECT 1 FROM oauth_bindings b WHERE b.account_id = a.id)
+        ORDER BY expires_at NULLS FIRST
+        LIMIT $2
+        """,
+        within_seconds,
+        limit,
+    )
+    return [dict(row) for row in rows]
+
+
+async def mark_google_account_refresh_failed(account_id: int, error: str) -> None:
+    """Flag an account whose refresh token Google rejected."""
+    pool = get_pool()
+    await pool.execute(
+        """
+        UPDATE google_accounts
+        SET refresh_failed_at = NOW(), refresh_error = $2, updated_at = NOW()
+        WHERE id = $1
+        """,
+        account_id,
+        error,
+    )
+
+
 async def update_folder_id(
     user_id: int,
     chat_id: int,
     topic_id: int | None,
     folder_id: str | None,
+    folder_path: str | None = None,
 ) -> None:
     """Set the upload folder for a user+chat+topic connection."""
     pool = get_pool()
     await pool.execute(
         """
-        UPDATE oauth_tokens
-        SET folder_id = $4, updated_at = NOW()
+        UPDATE oauth_bindings
+        SET folder_id = $4, folder_path = $5, updated_at = NOW()
         WHERE user_id = $1 AND chat_id = $2 AND topic_id IS NOT DISTINCT FROM $3
         """,
         user_id,
         chat_id,
         topic_id,
         folder_id,
+        folder_path,
+    )
+
+
+async def get_drive_folder(
+    account_email: str, parent_id: str, name: str
+) -> dict | None:
+    """Look up a cached folder by account, parent and name."""
+    pool = get_pool()
+    row = await pool.fetchrow(
+        """
+        SELECT folder_id, verified_at FROM drive_folders
+        WHERE account_email = $1 AND parent_id = $2 AND name = $3
+        """,
+        account_email,
+        parent_id,
+        name,
+    )
+    if row:
+        return {"folder_id": row["folder_id"], "verified_at": row["verified_at"]}
+    return None
+
+
+async def save_drive_folder(
+    account_email: str, parent_id: str, name: str, folder_id: str
+) -> str:
+    """Cache a resolved folder. Returns the cached folder_id.
+
+    If another process cached the same folder first, its folder_id wins.
+    """
+    pool = get_pool()
+    return await pool.fetchval(
+        """
+        INSERT INTO drive_folders (account_email, parent_id, name, folder_id)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (account_email, parent_id, name) DO UPDATE SET
+            verified_at = NOW()
+        RETURNING folder_id
+        """,
+        account_email,
+        parent_id,
+        name,
+        folder_id,
+    )
+
+
+async def touch_drive_folder(account_email: str, folder_id: str) -> None:
+    """Record that a cached folder still exists."""
+    pool = get_pool()
+    await pool.execute(
+        """
+        UPDATE drive_folders SET verified_at = NOW()
+        WHERE account_email = $1 AND folder_id = $2
+        """,
+        account_email,
+        folder_id,
+    )
+
+
+async def delete_drive_folder(account_email: str, folder_id: str) -> None:
+    """Forget a folder that was trashed or deleted, and its cached children."""
+    pool = get_pool()
+    await pool.execute(
+        """
+        DELETE FROM drive_folders
+        WHERE account_email = $1 AND (folder_id = $2 OR parent_id = $2)
+        """,
+        account_email,
+        folder_id,
+    )
+
+
+async def enqueue_upload_jobs(
+    user_id: int,
+    chat_id: int,
+    topic_id: int | None,
+    files: list[tuple[str, str, str, int, str]],
+    status_message_id: int | None,
+) -> list[int]:
+    """Queue (file_id, name, mime_type, size, file_unique_id) files in one
+    round trip.
+
+    Files queued together share the status message and are reported as a
+    batch. Returns the job ids.
+    """
+    pool = get_pool()
+    file_ids, file_names, mime_types, file_sizes, unique_ids = zip(*files, strict=True)
+    rows = await pool.fetch(
+        """
+        INSERT INTO upload_jobs (
+            user_id, chat_id, topic_id, file_id, file_name, mime_type,
+            file_size, file_unique_id, status_message_id, batch_size
+        )
+        SELECT $1, $2, $3, f.file_id, f.file_name, f.mime_type, f.file_size,
+               f.file_unique_id, $4, $5
+        FROM unnest(
+            $6::text[], $7::text[], $8::text[], $9::bigint[], $10::text[]
+        ) WITH ORDINALITY AS f(
+            file_id, file_name, mime_type, file_size, file_unique_id, n
+        )
+        ORDER BY f.n
+        RETURNING id
+        """,
+        user_id,
+        chat_id,
+        topic_id,
+        status_message_id,
+        len(files),
+        list(file_ids),
+        list(file_names),
+        list(mime_types),
+        list(file_sizes),
+        list(unique_ids),
+    )
+    return [row["id"] for row in rows]
+
+
+async def claim_upload_job(
+    lease_seconds: int,
+    shard: int = 0,
+    shard_count: int = 1,
+    max_file_size: int | None = None,
+    chat_concurrency: int | None = None,
+    min_job_cost: int = 0,
+    aging_rate: float = 0,
+) -> dict | None:
+    """Lock the next due job for this worker.
+
+    Picks pending jobs whose run_at has passed and running jobs whose lease
+    expired (their worker died). SKIP LOCKED lets many workers and bot
+    replicas claim concurrently without blocking each other. Only chats
+    with abs(chat_id) % shard_count == shard are considered.
+
+    Jobs are taken in weighted fair order across (chat_id, user_id) flows:
+    each flow offers its oldest job, and the one whose flow would then
+    have the fewest bytes running wins (each job counting at least
+    `min_job_cost`). A flow queueing many large files therefore can't
+    delay other flows' small ones. Each second a job has been due takes
+    `aging_rate` bytes off its cost, so the order is by virtual finish
+    time (run_at + bytes / aging_rate) and a large file is not passed
+    over forever by a steady supply of small ones. Only files up to
+    `max_file_size` are taken if set, and chats already running
+    `chat_concurrency` jobs are skipped (approximately: concurrent claims
+    may briefly exceed it).
+    """
+    pool = get_pool()
+    row = await pool.fetchrow(
+        """
+        WITH running AS (
+            SELECT chat_id, user_id, count(*) AS jobs, sum(file_size) AS bytes
+            FROM upload_jobs
+            WHERE status = 'running' AND locked_until >= NOW()
+            GROUP BY chat_id, user_id
+        ),
+        chat_running AS (
+            SELECT chat_id, sum(jobs) AS jobs FROM running GROUP BY chat_id
+        ),
+        heads AS (
+            SELECT DISTINCT ON (chat_id, user_id)
+                   id, chat_id, user_id, file_size, run_at
+            FROM upload_jobs
+            WHERE ((status = 'pending' AND run_at <= NOW())
+                   OR (status = 'running' AND locked_until < NOW()))
+              AND abs(chat_id) % $3 = $2
+              AND ($4::bigint IS NULL OR file_size <= $4)
+            ORDER BY chat_id, user_id, run_at, id
+        ),
+        candidates AS (
+            SELECT h.id, h.run_at,
+                   coalesce(r.bytes, 0) + greatest(h.file_size, $6)
+                   - $7 * extract(epoch FROM NOW() - h.run_at) AS finish
+            FROM heads h
+            LEFT JOIN running r ON r.chat_id = h.chat_id AND r.user_id = h.user_id
+            LEFT JOIN chat_running c ON c.chat_id = h.chat_id
+            WHERE $5::bigint IS NULL OR coalesce(c.jobs, 0) < $5
+        )
+        UPDATE upload_jobs
+        SET status = 'running',
+            attempts = attempts + 1,
+            locked_until = NOW() + make_interval(secs => $1),
+            updated_at = NOW()
+        WHERE id = (
+            SELECT j.id
+            FROM candidates c
+            JOIN upload_jobs j ON j.id = c.id
+            -- Rechecked on the locked row in case another worker claimed
+            -- it since the snapshot above
+            WHERE (j.status = 'pending' AND j.run_at <= NOW())
+               OR (j.status = 'running' AND j.locked_until < NOW())
+            ORDER BY c.finish, c.run_at
+            LIMIT 1
+            FOR UPDATE OF j SKIP LOCKED
+        )
+        RETURNING *
+        """,
+        lease_seconds,
+        shard,
+        shard_count,
+        max_file_size,
+        chat_concurrency,
+        min_job_cost,
+        aging_rate,
+    )
+    return dict(row) if row else None
+
+
+async def extend_upload_job_lease(
+    job_id: int, attempt: int, lease_seconds: int
+) -> bool:
+    """Push back the lease of a job that is still being worked on.
+
+    Returns False if the claim made on `attempt` no longer holds the job.
+    """
+    pool = get_pool()
+    result = await pool.execute(
+        """
+        UPDATE upload_jobs
+        SET locked_until = NOW() + make_interval(secs => $3)
+        WHERE id = $1 AND attempts = $2 AND status = 'running'
+        """,
+        job_id,
+        attempt,
+        lease_seconds,
+    )
+    return _updated(result)
+
+
+async def save_upload_checkpoint(
+    job_id: int, attempt: int, session_uri: str, offset: int
+) -> None:
+    """Record the Drive upload session of a job and how much it has received."""
+    pool = get_pool()
+    await pool.execute(
+        """
+        UPDATE upload_jobs
+        SET upload_session_uri = $3, upload_offset = $4
+        WHERE id = $1 AND attempts = $2 AND status = 'running'
+        """,
+        job_id,
+        attempt,
+        session_uri,
+        offset,
+    )
+
+
+# The functions below finish the claim made on `attempt` and return False,
+# changing nothing, if the job has been reclaimed since (its lease expired)
+
+
+async def complete_upload_job(job_id: int, attempt: int, result_link: str) -> bool:
+    """Mark a job as successfully uploaded."""
+    pool = get_pool()
+    result = await pool.execute(
+        """
+        UPDATE upload_jobs
+        SET status = 'done', locked_until = NULL, last_error = NULL,
+            result_link = $3, upload_session_uri = NULL, updated_at = NOW()
+        WHERE id = $1 AND attempts = $2 AND status = 'running'
+        """,
+        job_id,
+        attempt,
+        result_link,
+    )
+    return _updated(result)
+
+
+async def retry_upload_job(
+    job_id: int, attempt: int, delay_seconds: float, error: str
+) -> bool:
+    """Put a failed job back in the queue to run again after a delay."""
+    pool = get_pool()
+    result = await pool.execute(
+        """
+        UPDATE upload_jobs
+        SET status = 'pending', locked_until = NULL, last_error = $4,
+            run_at = NOW() + make_interval(secs => $3), updated_at = NOW()
+        WHERE id = $1 AND attempts = $2 AND status = 'running'
+        """,
+        job_id,
+        attempt,
+        delay_seconds,
+        error,
+    )
+    return _updated(result)
+
+
+async def fail_upload_job(job_id: int, attempt: int, error: str) -> bool:
+    """Mark a job as permanently failed."""
+    pool = get_pool()
+    result = await pool.execute(
+        """
+        UPDATE upload_jobs
+        SET status = 'failed', locked_until = NULL, last_error = $3,
+            updated_at = NOW()
+        WHERE id = $1 AND attempts = $2 AND status = 'running'
+        """,
+        job_id,
+        attempt,
+        error,
+    )
+    return _updated(result)
+
+
+async def release_upload_job(
+    job_id: int,
+    attempt: int,
+    delay_seconds: float = 0,
+    error: str | None = None,
+) -> bool:
+    """Hand an interrupted job back to the queue without counting the attempt.
+
+    With `delay_seconds` the job runs again no sooner than that; `error`
+    replaces its last error if given.
+    """
+    pool = get_pool()
+    result = await pool.execute(
+        """
+        UPDATE upload_jobs
+        SET status = 'pending', locked_until = NULL,
+            attempts = GREATEST(attempts - 1, 0),
+            run_at = GREATEST(run_at, NOW() + make_interval(secs => $3)),
+            last_error = COALESCE($4, last_error), updated_at = NOW()
+        WHERE id = $1 AND attempts = $2 AND status = 'running'
+        """,
+        job_id,
+        attempt,
+        delay_seconds,
+        error,
+    )
+    return _updated(result)
+
+
+def _updated(status: str) -> bool:
+    # Command status of an UPDATE is "UPDATE <rows>"
+    return status != "UPDATE 0"
+
+
+async def get_upload_batch(chat_id: int, status_message_id: int) -> list[dict]:
+    """All jobs reported on one status message, in queue order."""
+    pool = get_pool()
+    rows = await pool.fetch(
+        """
+        SELECT id, file_name, status, result_link
+        FROM upload_jobs
+        WHERE chat_id = $1 AND status_message_id = $2
+        ORDER BY id
+        """,
+        chat_id,
+        status_message_id,
+    )
+    return [dict(row) for row in rows]
+
+
+async def find_uploaded_file(
+    account_email: str,
+    folder_id: str,
+    file_unique_id: str | None = None,
+    md5_checksum: str | None = None,
+) -> dict | None:
+    """Find a previous upload of the same file into the same folder."""
+    pool = get_pool()
+    row = await pool.fetchrow(
+        """
+        SELECT drive_file_id, web_view_link FROM uploaded_files
+        WHERE account_email = $1 AND folder_id = $2
+          AND (file_unique_id = $3 OR md5_checksum = $4)
+        LIMIT 1
+        """,
+        account_email,
+        folder_id,
+        file_unique_id,
+        md5_checksum,
+    )
+    if row:
+        return {
+            "drive_file_id": row["drive_file_id"],
+            "web_view_link": row["web_view_link"],
+        }
+    return None
+
+
+async def save_uploaded_file(
+    account_email: str,
+    folder_id: str,
+    file_unique_id: str,
+    md5_checksum: str | None,
+    drive_file_id: str,
+    web_view_link: str,
+) -> None:
+    """Record an upload in the dedup index."""
+    pool = get_pool()
+    await pool.execute(
+        """
+        INSERT INTO uploaded_files (
+            account_email, folder_id, file_unique_id, md5_checksum,
+            drive_file_id, web_view_link
+        )
+        VALUES ($1, $2, $3, $4, $5, $6)
+        ON CONFLICT (account_email, folder_id, file_unique_id) DO UPDATE SET
+            md5_checksum = $4,
+            drive_file_id = $5,
+            web_view_link = $6,
+            created_at = NOW()
+        """,
+        account_email,
+        folder_id,
+        file_unique_id,
+        md5_checksum,
+        drive_file_id,
+        web_view_link,
+    )
+
+
+async def delete_uploaded_file(account_email: str, drive_file_id: str) -> None:
+    """Drop dedup entries pointing at a Drive file that no longer exists."""
+    pool = get_pool()
+    await pool.execute(
+        "DELETE FROM uploaded_files WHERE account_email = $1 AND drive_file_id = $2",
+        account_email,
+        drive_file_id,
+    )
+
+
+# Columns of an uploads row, in the order insert_upload_history copies them
+UPLOAD_HISTORY_COLUMNS = (
+    "job_id",
+    "user_id",
+    "chat_id",
+    "topic_id",
+    "file_name",
+    "mime_type",
+    "file_size",
+    "drive_file_id",
+    "web_view_link",
+    "outcome",
+    "error",
+    "attempts",
+    "duration",
+    "created_at",
+)
+
+
+async def insert_upload_history(rows: list[dict]) -> None:
+    """Append finished uploads and add them to the daily totals.
+
+    Rows are written with COPY; the totals are summed here first so each
+    connection's day is updated once per batch. Both happen in one
+    transaction.
+    """
+    if not rows:
+        return
+    totals: dict[tuple, list] = {}
+    for row in rows:
+        key = (
+            row["user_id"],
+            row["chat_id"],
+            row["topic_id"],
+            row["created_at"].astimezone(timezone.utc).date(),
+        )
+        total = totals.setdefault(key, [0, 0, 0, 0.0])
+        if row["outcome"] == "done":
+            total[0] += 1
+            total[2] += row["file_size"]
+            total[3] += row["duration"]
+        else:
+            total[1] += 1
+    # Same lock order in every batch, so concurrent writers can't deadlock
+    keys = sorted(totals, key=lambda k: (k[0], k[1], k[2] or 0, k[3]))
+    columns = list(zip(*(key + tuple(totals[key]) for key in keys)))
+
+    pool = get_pool()
+    async with pool.acquire() as conn, conn.transaction():
+        await conn.copy_records_to_table(
+            "uploads",
+            records=[tuple(row[c] for c in UPLOAD_HISTORY_COLUMNS) for row in rows],
+            columns=UPLOAD_HISTORY_COLUMNS,
+        )
+        await conn.execute(
+            """
+            INSERT INTO upload_stats (
+                user_id, chat_id, topic_id, day, uploads, failures, bytes,
+                duration
+            )
+            SELECT * FROM unnest(
+                $1::bigint[], $2::bigint[], $3::bigint[], $4::date[],
+                $5::int[], $6::int[], $7::bigint[], $8::float8[]
+            )
+            ON CONFLICT (user_id, chat_id, topic_id, day) DO UPDATE SET
+                uploads = upload_stats.uploads + EXCLUDED.uploads,
+                failures = upload_stats.failures + EXCLUDED.failures,
+                bytes = upload_stats.bytes + EXCLUDED.bytes,
+                duration = upload_stats.duration + EXCLUDED.duration
+            """,
+            *(list(column) for column in columns),
+        )
+
+
+async def get_upload_history(
+    user_id: int,
+    chat_id: int,
+    topic_id: int | None,
+    before_id: int | None,
+    limit: int,
+) -> list[dict]:
+    """A page of a connection's uploads, newest first.
+
+    Pass the smallest id of the previous page as `before_id` to get the
+    next one; each page is an index range scan, however deep.
+    """
+    pool = get_pool()
+    rows = await pool.fetch(
+        """
+        SELECT id, file_name, file_size, web_view_link, outcome, created_at
+        FROM uploads
+        WHERE user_id = $1 AND chat_id = $2
+          AND COALESCE(topic_id, 0) = COALESCE($3::bigint, 0)
+          AND id < COALESCE($4::bigint, 9223372036854775807)
+        ORDER BY id DESC
+        LIMIT $5
+        """,
+        user_id,
+        chat_id,
+        topic_id,
+        before_id,
+        limit,
+    )
+    return [dict(row) for row in rows]
+
+
+async def get_upload_stats(
+    user_id: int, chat_id: int, topic_id: int | None, recent_days: int
+) -> dict:
+    """Upload totals of a connection, overall and for the last `recent_days`."""
+    pool = get_pool()
+    row = await pool.fetchrow(
+        """
+        SELECT COALESCE(sum(uploads), 0) AS uploads,
+               COALESCE(sum(failures), 0) AS failures,
+               COALESCE(sum(bytes), 0)::bigint AS bytes,
+               COALESCE(sum(duration), 0) AS duration,
+               COALESCE(sum(uploads) FILTER (WHERE day > $4), 0) AS recent_uploads,
+               COALESCE(sum(failures) FILTER (WHERE day > $4), 0)
+                   AS recent_failures,
+               COALESCE(sum(bytes) FILTER (WHERE day > $4), 0)::bigint
+                   AS recent_bytes
+        FROM upload_stats
+        WHERE user_id = $1 AND chat_id = $2 AND topic_id IS NOT DISTINCT FROM $3
+        """,
+        user_id,
+        chat_id,
+        topic_id,
+        datetime.now(timezone.utc).date() - timedelta(days=recent_days),
     )
+    return dict(row)
@@ -1,31 +1,263 @@
 import asyncio
 import logging
+import signal
+import socket
 import sys
+from dataclasses import replace
+
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.dispatcher.middlewares.base import BaseMiddleware
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import SimpleFilesPathWrapper, TelegramAPIServer
 from aiogram.enums import ParseMode
+from aiogram.types import TelegramObject
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
 
-from config import BOT_TOKEN
+from config import (
+    BOT_MODE,
+    BOT_PROCESSES,
+    BOT_TOKEN,
+    METRICS_PORT,
+    OAUTH_STATE_PURGE_INTERVAL,
+    SHUTDOWN_DRAIN_TIMEOUT,
+    TELEGRAM_API_URL,
+    TELEGRAM_LOCAL_FILES_DIR,
+    TELEGRAM_LOCAL_MODE,
+    TELEGRAM_SERVER_FILES_DIR,
+    TOKEN_REFRESH_INTERVAL,
+    WEBHOOK_HOST,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+)
 from db.connection import init_pool, close_pool
 from bot.handlers import router
+from bot.media_groups import flush_media_groups
+from bot.outbox import flush_outbox, share_global_rate
+from bot.sharding import ShardRouter, feed_updates
+from bot.workers import start_workers, stop_workers
+from services.drive_client import init_session, close_session
+from services.executor import init_executor, shutdown_executor
+from services.metrics import start_metrics_server, stop_metrics_server
+from services.oauth_states import purge_stale_oauth_states
+from services.periodic import start_periodic, stop_periodic
+from services.token_refresher import refresh_expiring_tokens
+from services.upload_history import start_history_writer, stop_history_writer
 
 
-async def main() -> None:
-    if not BOT_TOKEN:
-        raise RuntimeError("BOT_TOKEN environment variable is not set")
+def create_bot() -> Bot:
+    """Create the bot, pointed at a self-hosted Bot API server if configured."""
+    session = None
+    if TELEGRAM_API_URL:
+        server = TelegramAPIServer.from_base(
+            TELEGRAM_API_URL, is_local=TELEGRAM_LOCAL_MODE
+        )
+        if TELEGRAM_SERVER_FILES_DIR and TELEGRAM_LOCAL_FILES_DIR:
+            # The server's file paths are mounted elsewhere in this container
+            server = replace(
+                server,
+                wrap_local_file=SimpleFilesPathWrapper(
+                    Path(TELEGRAM_SERVER_FILES_DIR), Path(TELEGRAM_LOCAL_FILES_DIR)
+                ),
+            )
+        session = AiohttpSession(api=server)
+    return Bot(
+        token=BOT_TOKEN,
+        session=session,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
+
+
+class _UpdateTasks(BaseMiddleware):
+    """Outer update middleware that tracks updates being handled."""
+
+    def __init__(self):
+        self._tasks: set[asyncio.Task] = set()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        task = asyncio.current_task()
+        if task is None:
+            return await handler(event, data)
+        self._tasks.add(task)
+        try:
+            return await handler(event, data)
+        finally:
+            self._tasks.discard(task)
+
+    async def wait(self, timeout: float) -> None:
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=timeout)
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher, handle_as_tasks: bool = True) -> None:
+    """Serve Telegram webhook updates until SIGINT/SIGTERM.
 
+    With `handle_as_tasks` each update is answered at once and handled in
+    the background, like polling does. Otherwise a request is answered
+    after its update is handled, so the next one waits.
+    """
+    if not WEBHOOK_URL:
+        raise RuntimeError("WEBHOOK_URL environment variable is not set")
+
+    updates = _UpdateTasks()
+    if handle_as_tasks:
+        # Handlers wait on paced replies; holding the request open for
+        # that long makes Telegram time out and deliver the update again
+        dp.update.outer_middleware(updates)
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=handle_as_tasks,
+        secret_token=WEBHOOK_SECRET,
+    ).register(app, path=WEBHOOK_PATH)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT, backlog=1024)
+    await site.start()
+
+    await bot.set_webhook(
+        f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    logging.info("Webhook server listening on %s:%s", WEBHOOK_HOST, WEBHOOK_PORT)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await stop.wait()
+    finally:
+        # Stops accepting connections and waits for in-flight requests,
+        # then for updates still being handled in the background
+        await runner.cleanup()
+        await updates.wait(SHUTDOWN_DRAIN_TIMEOUT)
+
+
+async def start_services(shard: int = 0, shard_count: int = 1) -> Bot:
+    """Open shared resources and start background work for one process."""
     await init_pool()
+    init_executor()
+    await init_session()
+
+    bot = create_bot()
+
+    # Shards serve metrics on consecutive ports
+    await start_metrics_server(METRICS_PORT + shard if METRICS_PORT else 0)
+    share_global_rate(shard_count)
+    start_history_writer()
+    start_workers(bot, shard, shard_count)
+    if shard == 0:
+        # Database-wide housekeeping, once per replica
+        start_periodic(
+            "token-refresher", refresh_expiring_tokens, TOKEN_REFRESH_INTERVAL
+        )
+        start_periodic(
+            "oauth-state-purge", purge_stale_oauth_states, OAUTH_STATE_PURGE_INTERVAL
+        )
+    return bot
 
-    bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+
+async def stop_services(bot: Bot) -> None:
+    # Drain: queue pending albums, let running uploads finish, then
+    # release shared resources
+    await flush_media_groups()
+    await stop_periodic()
+    await stop_workers(SHUTDOWN_DRAIN_TIMEOUT)
+    await stop_history_writer(SHUTDOWN_DRAIN_TIMEOUT)
+    await flush_outbox(SHUTDOWN_DRAIN_TIMEOUT)
+    await bot.session.close()
+    await close_session()
+    await stop_metrics_server()
+    shutdown_executor()
+    await close_pool()
+
+
+async def receive_updates(
+    bot: Bot, dp: Dispatcher, handle_as_tasks: bool = True
+) -> None:
+    """Take updates by webhook or polling until shutdown."""
+    if BOT_MODE == "webhook":
+        await run_webhook(bot, dp, handle_as_tasks)
+    else:
+        await dp.start_polling(bot, handle_as_tasks=handle_as_tasks)
+
+
+async def serve_shard(shard: int, shard_count: int, sock: socket.socket) -> None:
+    bot = await start_services(shard, shard_count)
     dp = Dispatcher()
+    dp.include_router(router)
+    try:
+        await feed_updates(sock, bot, dp)
+    finally:
+        await stop_services(bot)
+
+
+def run_shard(shard: int, shard_count: int, sock: socket.socket) -> None:
+    """Entry point of a shard process in multi-process mode."""
+    # The front process decides when to stop by closing `sock`, also when
+    # it dies, so signals sent to the whole process group are ignored
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    logging.basicConfig(
+        level=logging.INFO,
+        stream=sys.stdout,
+        format=f"%(levelname)s:shard-{shard}:%(name)s:%(message)s",
+    )
+    asyncio.run(serve_shard(shard, shard_count, sock))
+
 
+async def run_front(dp: Dispatcher) -> None:
+    """Receive updates and pass them to BOT_PROCESSES shard processes."""
+    bot = create_bot()
+    shards = ShardRouter(run_shard, BOT_PROCESSES)
+    # The router stays included so the same update types are requested,
+    # but its handlers only run in the shards
+    dp.update.outer_middleware(shards)
+    await shards.start()
+    try:
+        # One update at a time keeps each chat's updates in order
+        await receive_updates(bot, dp, handle_as_tasks=False)
+    finally:
+        # Shards drain their uploads and then the outbox
+        await shards.stop(2 * SHUTDOWN_DRAIN_TIMEOUT + 10)
+        await bot.session.close()
+
+
+async def main() -> None:
+    if not BOT_TOKEN:
+        raise RuntimeError("BOT_TOKEN environment variable is not set")
+
+    dp = Dispatcher()
     dp.include_router(router)
 
+    if BOT_PROCESSES > 1:
+        await run_front(dp)
+        return
+
+    bot = await start_services()
     try:
-        await dp.start_polling(bot)
+        await receive_updates(bot, dp)
     finally:
-        await close_pool()
+        await stop_services(bot)
 
 
 if __name__ == "__main__":
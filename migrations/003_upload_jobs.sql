@@ -0,0 +1,25 @@
+-- Upload jobs: durable queue of files waiting to be copied to Google Drive
+CREATE TABLE IF NOT EXISTS upload_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    chat_id BIGINT NOT NULL,
+    topic_id BIGINT,
+    file_id TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    mime_type TEXT NOT NULL,
+    file_size BIGINT NOT NULL DEFAULT 0,
+    status_message_id BIGINT,  -- Telegram message updated with progress
+    status TEXT NOT NULL DEFAULT 'pending',  -- pending, running, done, failed
+    attempts INT NOT NULL DEFAULT 0,
+    last_error TEXT,
+    run_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    locked_until TIMESTAMPTZ,  -- lease of the worker running the job
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Workers claim due pending jobs and running jobs whose lease has expired
+CREATE INDEX IF NOT EXISTS idx_upload_jobs_pending
+    ON upload_jobs(run_at) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_upload_jobs_running
+    ON upload_jobs(locked_until) WHERE status = 'running';
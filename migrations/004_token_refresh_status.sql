@@ -0,0 +1,7 @@
+-- Track refresh tokens Google has rejected so uploads can fail fast
+ALTER TABLE oauth_tokens ADD COLUMN refresh_failed_at TIMESTAMPTZ DEFAULT NULL;
+ALTER TABLE oauth_tokens ADD COLUMN refresh_error TEXT DEFAULT NULL;
+
+-- Background refresher scans for tokens that are about to expire
+CREATE INDEX IF NOT EXISTS idx_oauth_tokens_expires_at
+    ON oauth_tokens(expires_at) WHERE refresh_failed_at IS NULL;
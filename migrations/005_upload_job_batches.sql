@@ -0,0 +1,6 @@
+-- Album uploads: jobs queued from one media group share a status message
+ALTER TABLE upload_jobs ADD COLUMN batch_size INT NOT NULL DEFAULT 1;
+ALTER TABLE upload_jobs ADD COLUMN result_link TEXT DEFAULT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_upload_jobs_status_message
+    ON upload_jobs(chat_id, status_message_id);
@@ -0,0 +1,16 @@
+-- Resolved Drive folders per Google account, so folder paths can be
+-- resolved without Drive API calls
+CREATE TABLE IF NOT EXISTS drive_folders (
+    account_email TEXT NOT NULL,
+    parent_id TEXT NOT NULL,  -- 'root' for top-level folders
+    name TEXT NOT NULL,
+    folder_id TEXT NOT NULL,
+    verified_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (account_email, parent_id, name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_drive_folders_folder_id
+    ON drive_folders(account_email, folder_id);
+
+-- Folder path set with /setfolder, e.g. 'Books/2026/Sci-Fi'
+ALTER TABLE oauth_tokens ADD COLUMN folder_path TEXT DEFAULT NULL;
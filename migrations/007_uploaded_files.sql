@@ -0,0 +1,17 @@
+-- Dedup index: files already uploaded per Google account and folder
+CREATE TABLE IF NOT EXISTS uploaded_files (
+    account_email TEXT NOT NULL,
+    folder_id TEXT NOT NULL,  -- 'root' when uploaded without a folder
+    file_unique_id TEXT NOT NULL,  -- Telegram id, stable across reposts
+    md5_checksum TEXT,
+    drive_file_id TEXT NOT NULL,
+    web_view_link TEXT NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (account_email, folder_id, file_unique_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_uploaded_files_md5
+    ON uploaded_files(account_email, folder_id, md5_checksum)
+    WHERE md5_checksum IS NOT NULL;
+
+ALTER TABLE upload_jobs ADD COLUMN file_unique_id TEXT DEFAULT NULL;
@@ -0,0 +1,4 @@
+-- Resumable Drive upload sessions, so a retried job continues where the
+-- previous attempt stopped instead of starting from byte zero
+ALTER TABLE upload_jobs ADD COLUMN upload_session_uri TEXT DEFAULT NULL;
+ALTER TABLE upload_jobs ADD COLUMN upload_offset BIGINT NOT NULL DEFAULT 0;
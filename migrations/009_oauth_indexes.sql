@@ -0,0 +1,24 @@
+-- UNIQUE(user_id, chat_id, topic_id) treats NULL topic_ids as distinct, so
+-- upserts for non-topic chats never conflicted and could insert duplicates.
+-- Keep the most recently updated row of each duplicate group.
+DELETE FROM oauth_tokens t
+USING oauth_tokens newer
+WHERE t.user_id = newer.user_id
+  AND t.chat_id = newer.chat_id
+  AND t.topic_id IS NOT DISTINCT FROM newer.topic_id
+  AND (COALESCE(t.updated_at, t.created_at, '-infinity'), t.id)
+    < (COALESCE(newer.updated_at, newer.created_at, '-infinity'), newer.id);
+
+ALTER TABLE oauth_tokens
+    DROP CONSTRAINT IF EXISTS oauth_tokens_user_id_chat_id_topic_id_key;
+ALTER TABLE oauth_tokens
+    ADD CONSTRAINT oauth_tokens_user_chat_topic_key
+    UNIQUE NULLS NOT DISTINCT (user_id, chat_id, topic_id);
+-- Same columns as the new constraint's index
+DROP INDEX IF EXISTS idx_oauth_tokens_user_chat_topic;
+
+-- Pending /connect lookups (latest state per context) and the stale purge
+CREATE INDEX IF NOT EXISTS idx_oauth_states_context
+    ON oauth_states(user_id, chat_id, topic_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_oauth_states_created_at
+    ON oauth_states(created_at);
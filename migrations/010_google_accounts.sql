@@ -0,0 +1,76 @@
+-- Google credentials are stored once per account and shared by every
+-- chat/topic connected to it, so a token is refreshed once for all of them.
+-- oauth_bindings says which account (and folder) each context uses.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS google_accounts (
+    id BIGSERIAL PRIMARY KEY,
+    email TEXT UNIQUE,  -- NULL if unknown; such accounts are never shared
+    access_token TEXT NOT NULL,
+    refresh_token TEXT NOT NULL,
+    expires_at TIMESTAMPTZ,
+    refresh_failed_at TIMESTAMPTZ DEFAULT NULL,
+    refresh_error TEXT DEFAULT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS oauth_bindings (
+    id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    chat_id BIGINT NOT NULL,
+    topic_id BIGINT,  -- NULL for non-topic chats
+    account_id BIGINT NOT NULL REFERENCES google_accounts(id) ON DELETE CASCADE,
+    folder_id TEXT DEFAULT NULL,
+    folder_path TEXT DEFAULT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    CONSTRAINT oauth_bindings_user_chat_topic_key
+        UNIQUE NULLS NOT DISTINCT (user_id, chat_id, topic_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_oauth_bindings_account_id
+    ON oauth_bindings(account_id);
+-- Background refresher scans for tokens that are about to expire
+CREATE INDEX IF NOT EXISTS idx_google_accounts_expires_at
+    ON google_accounts(expires_at) WHERE refresh_failed_at IS NULL;
+
+-- One account per email, from its most recently updated working token.
+-- Rows without an email keep a credential of their own, matched back
+-- through a temporary column.
+ALTER TABLE google_accounts ADD COLUMN legacy_token_id INT;
+
+INSERT INTO google_accounts (
+    email, access_token, refresh_token, expires_at, refresh_failed_at,
+    refresh_error, created_at, updated_at
+)
+SELECT DISTINCT ON (email)
+       email, access_token, refresh_token, expires_at, refresh_failed_at,
+       refresh_error, created_at, updated_at
+FROM oauth_tokens
+WHERE email <> ''
+ORDER BY email, refresh_failed_at IS NOT NULL, updated_at DESC NULLS LAST, id DESC;
+
+INSERT INTO google_accounts (
+    email, access_token, refresh_token, expires_at, refresh_failed_at,
+    refresh_error, created_at, updated_at, legacy_token_id
+)
+SELECT NULL, access_token, refresh_token, expires_at, refresh_failed_at,
+       refresh_error, created_at, updated_at, id
+FROM oauth_tokens
+WHERE COALESCE(email, '') = '';
+
+INSERT INTO oauth_bindings (
+    user_id, chat_id, topic_id, account_id, folder_id, folder_path,
+    created_at, updated_at
+)
+SELECT t.user_id, t.chat_id, t.topic_id, a.id, t.folder_id, t.folder_path,
+       t.created_at, t.updated_at
+FROM oauth_tokens t
+JOIN google_accounts a
+  ON a.email = t.email OR a.legacy_token_id = t.id;
+
+ALTER TABLE google_accounts DROP COLUMN legacy_token_id;
+DROP TABLE oauth_tokens;
+
+COMMIT;
@@ -0,0 +1,36 @@
+-- Append-only log of finished uploads, written in batches off the upload path
+CREATE TABLE IF NOT EXISTS uploads (
+    id BIGSERIAL PRIMARY KEY,
+    job_id BIGINT,
+    user_id BIGINT NOT NULL,
+    chat_id BIGINT NOT NULL,
+    topic_id BIGINT,
+    file_name TEXT NOT NULL,
+    mime_type TEXT,
+    file_size BIGINT NOT NULL DEFAULT 0,
+    drive_file_id TEXT,
+    web_view_link TEXT,
+    outcome TEXT NOT NULL,  -- done or failed
+    error TEXT,
+    attempts INT NOT NULL DEFAULT 1,
+    duration REAL NOT NULL,  -- seconds taken by the last attempt
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- /history walks one connection's uploads newest first (keyset on id)
+CREATE INDEX IF NOT EXISTS idx_uploads_history
+    ON uploads(user_id, chat_id, COALESCE(topic_id, 0), id);
+
+-- Daily totals per connection, updated with each batch of uploads, for /stats
+CREATE TABLE IF NOT EXISTS upload_stats (
+    user_id BIGINT NOT NULL,
+    chat_id BIGINT NOT NULL,
+    topic_id BIGINT,
+    day DATE NOT NULL,  -- UTC
+    uploads INT NOT NULL DEFAULT 0,
+    failures INT NOT NULL DEFAULT 0,
+    bytes BIGINT NOT NULL DEFAULT 0,
+    duration DOUBLE PRECISION NOT NULL DEFAULT 0,  -- seconds, successful uploads
+    CONSTRAINT upload_stats_user_chat_topic_day_key
+        UNIQUE NULLS NOT DISTINCT (user_id, chat_id, topic_id, day)
+);
@@ -0,0 +1,125 @@
+import logging
+import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+
+from config import BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT
+from services.metrics import (
+    BREAKER_REJECTED,
+    BREAKER_STATE,
+    register_collector,
+    register_health_check,
+)
+
+_breakers: list["CircuitBreaker"] = []
+# Values of the circuit_breaker_state gauge
+_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitOpenError(Exception):
+    """A dependency is failing; the call was rejected without being made."""
+
+    def __init__(self, name: str, description: str, retry_in: float):
+        super().__init__(f"{name} is unavailable, retrying in {retry_in:.0f}s")
+        self.name = name
+        self.description = description
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Fail fast while a dependency is down instead of waiting for timeouts.
+
+    After `failure_threshold` consecutive failures (exceptions for which
+    `is_failure` is true) the circuit opens and calls raise CircuitOpenError
+    for `reset_timeout` seconds. Then one call is let through as a probe:
+    if it succeeds the circuit closes, otherwise it opens again.
+    `description` names the dependency in messages to users, and
+    `critical` breakers make the process report itself as not ready.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        is_failure: Callable[[Exception], bool],
+        critical: bool = False,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+    ):
+        self.name = name
+        self.description = description
+        self.is_failure = is_failure
+        self.critical = critical
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        _breakers.append(self)
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._probing or time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def _enter(self) -> bool:
+        """Check that a call may go ahead; returns whether it is the probe."""
+        if self._opened_at is None:
+            return False
+        retry_in = self._opened_at + self.reset_timeout - time.monotonic()
+        if retry_in > 0 or self._probing:
+            BREAKER_REJECTED.inc(name=self.name)
+            raise CircuitOpenError(self.name, self.description, max(retry_in, 0))
+        self._probing = True
+        return True
+
+    def _record(self, error: Exception | None) -> None:
+        if error is None or not self.is_failure(error):
+            if self._opened_at is not None:
+                logging.info("Circuit %s closed", self.name)
+            self._failures = 0
+            self._opened_at = None
+            return
+        self._failures += 1
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                logging.warning(
+                    "Circuit %s opened after %s failures: %r",
+                    self.name,
+                    self._failures,
+                    error,
+                )
+            self._opened_at = time.monotonic()
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """Run the body as a call to the dependency."""
+        probe = self._enter()
+        try:
+            yield
+        except Exception as e:
+            self._record(e)
+            raise
+        else:
+            self._record(None)
+        finally:
+            if probe:
+                self._probing = False
+
+
+def _health() -> tuple[bool, dict]:
+    # Not ready while a critical dependency is known to be down
+    ready = not any(b.critical and b.state == "open" for b in _breakers)
+    return ready, {breaker.name: breaker.state for breaker in _breakers}
+
+
+def _collect_metrics() -> None:
+    for breaker in _breakers:
+        BREAKER_STATE.set(_STATE_VALUES[breaker.state], name=breaker.name)
+
+
+register_collector(_collect_metrics)
+register_health_check("circuit_breakers", _health)
@@ -0,0 +1,47 @@
+from db.queries import delete_uploaded_file, find_uploaded_file, save_uploaded_file
+from services.drive_folders import ROOT_FOLDER_ID
+from services.google_drive import is_file_available
+
+
+async def find_duplicate(
+    access_token: str,
+    account_email: str | None,
+    folder_id: str | None,
+    file_unique_id: str | None = None,
+    md5_checksum: str | None = None,
+) -> dict | None:
+    """Return an earlier upload of the same file (id, webViewLink), if still there.
+
+    Matches on Telegram's file_unique_id or on the content MD5. A match is
+    confirmed with one files.get so links to deleted files are not reused.
+    """
+    if not account_email or not (file_unique_id or md5_checksum):
+        return None
+    existing = await find_uploaded_file(
+        account_email, folder_id or ROOT_FOLDER_ID, file_unique_id, md5_checksum
+    )
+    if existing is None:
+        return None
+    if not await is_file_available(access_token, existing["drive_file_id"]):
+        await delete_uploaded_file(account_email, existing["drive_file_id"])
+        return None
+    return {"id": existing["drive_file_id"], "webViewLink": existing["web_view_link"]}
+
+
+async def remember_upload(
+    account_email: str | None,
+    folder_id: str | None,
+    file_unique_id: str | None,
+    file: dict,
+) -> None:
+    """Add an uploaded Drive file to the dedup index."""
+    if not account_email or not file_unique_id:
+        return
+    await save_uploaded_file(
+        account_email,
+        folder_id or ROOT_FOLDER_ID,
+        file_unique_id,
+        file.get("md5Checksum"),
+        file["id"],
+        file["webViewLink"],
+    )
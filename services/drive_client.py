@@ -0,0 +1,294 @@
+import asyncio
+import functools
+import logging
+from collections.abc import Awaitable, Callable
+
+import aiohttp
+
+from config import (
+    DRIVE_API_URL,
+    DRIVE_POOL_SIZE,
+    DRIVE_RATE_LIMIT_RETRIES,
+    DRIVE_REQUEST_TIMEOUT,
+    DRIVE_UPLOAD_URL,
+    GOOGLE_USERINFO_URL,
+)
+from services.circuit_breaker import CircuitBreaker
+from services.metrics import DRIVE_RATE_LIMITED
+from services.rate_limit import backoff_delay, current_bucket
+
+_session: aiohttp.ClientSession | None = None
+
+
+class DriveError(Exception):
+    """Error response from the Drive v3 API."""
+
+    def __init__(
+        self,
+        status: int,
+        message: str,
+        reason: str | None = None,
+        retry_after: float | None = None,
+    ):
+        super().__init__(f"Drive API error {status}: {message}")
+        self.status = status
+        self.message = message
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class DriveAuthError(DriveError):
+    """Access token was rejected (expired or revoked)."""
+
+
+async def init_session() -> aiohttp.ClientSession:
+    global _session
+    if _session is None:
+        connector = aiohttp.TCPConnector(limit=DRIVE_POOL_SIZE, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(
+            total=None, connect=10, sock_read=DRIVE_REQUEST_TIMEOUT
+        )
+        _session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return _session
+
+
+async def close_session() -> None:
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    if _session is None:
+        raise RuntimeError("Drive session not initialized. Call init_session() first.")
+    return _session
+
+
+def _auth_headers(access_token: str) -> dict[str, str]:
+    return {"Authorization": f"Bearer {access_token}"}
+
+
+async def _raise_for_error(response: aiohttp.ClientResponse) -> None:
+    if response.status < 400:
+        return
+    message = response.reason or ""
+    reason = None
+    try:
+        body = await response.json(content_type=None)
+        error = body.get("error", {})
+        message = error.get("message", message)
+        errors = error.get("errors") or []
+        if errors:
+            reason = errors[0].get("reason")
+    except (aiohttp.ContentTypeError, ValueError, AttributeError):
+        pass
+    if response.status == 401:
+        raise DriveAuthError(response.status, message, reason)
+    retry_after = None
+    if response.headers.get("Retry-After", "").isdigit():
+        retry_after = float(response.headers["Retry-After"])
+    raise DriveError(response.status, message, reason, retry_after)
+
+
+def is_rate_limited(error: DriveError) -> bool:
+    """Whether Drive rejected the request for exceeding a quota."""
+    if error.status == 429:
+        return True
+    return error.status == 403 and error.reason in (
+        "rateLimitExceeded",
+        "userRateLimitExceeded",
+    )
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a request failed because of Drive or the network, not the request."""
+    if isinstance(error, DriveError):
+        return error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, TimeoutError))
+
+
+# One for all accounts: an outage of Google's API affects them all
+_breaker = CircuitBreaker("drive", "Google Drive", is_transient)
+
+
+def _guarded[**P, T](
+    func: Callable[P, Awaitable[T]],
+) -> Callable[P, Awaitable[T]]:
+    """Fail fast with CircuitOpenError while Drive keeps failing."""
+
+    @functools.wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+        async with _breaker.guard():
+            return await func(*args, **kwargs)
+
+    return wrapper
+
+
+def _rate_limited[**P, T](
+    func: Callable[P, Awaitable[T]],
+) -> Callable[P, Awaitable[T]]:
+    """Throttle a call by the current account's quota and back off on 429/403.
+
+    A quota error pauses the whole account, so concurrent uploads of the
+    same user slow down together instead of each hammering the API.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+        bucket = current_bucket()
+        attempt = 0
+        while True:
+            if bucket:
+                await bucket.acquire()
+            try:
+                return await func(*args, **kwargs)
+            except DriveError as e:
+                if not is_rate_limited(e) or attempt >= DRIVE_RATE_LIMIT_RETRIES:
+                    raise
+                DRIVE_RATE_LIMITED.inc()
+                delay = backoff_delay(attempt, e.retry_after)
+                logging.warning("Drive quota exceeded, backing off %.1fs", delay)
+                attempt += 1
+                if bucket:
+                    bucket.pause(delay)
+                else:
+                    await asyncio.sleep(delay)
+
+    return wrapper
+
+
+@_guarded
+@_rate_limited
+async def list_files(access_token: str, query: str, fields: str) -> list[dict]:
+    """Run a files.list query and return the first page of matches."""
+    session = get_session()
+    async with session.get(
+        f"{DRIVE_API_URL}/files",
+        params={"q": query, "fields": fields, "spaces": "drive"},
+        headers=_auth_headers(access_token),
+    ) as response:
+        await _raise_for_error(response)
+        body = await response.json()
+    return body.get("files", [])
+
+
+@_guarded
+@_rate_limited
+async def get_file(access_token: str, file_id: str, fields: str) -> dict:
+    """Fetch file metadata by id."""
+    session = get_session()
+    async with session.get(
+        f"{DRIVE_API_URL}/files/{file_id}",
+        params={"fields": fields},
+        headers=_auth_headers(access_token),
+    ) as response:
+        await _raise_for_error(response)
+        return await response.json()
+
+
+@_guarded
+@_rate_limited
+async def create_file(access_token: str, metadata: dict, fields: str) -> dict:
+    """Create a metadata-only file (e.g. a folder)."""
+    session = get_session()
+    async with session.post(
+        f"{DRIVE_API_URL}/files",
+        params={"fields": fields},
+        json=metadata,
+        headers=_auth_headers(access_token),
+    ) as response:
+        await _raise_for_error(response)
+        return await response.json()
+
+
+@_guarded
+@_rate_limited
+async def start_resumable_upload(
+    access_token: str,
+    metadata: dict,
+    mime_type: str,
+    size: int | None,
+    fields: str,
+) -> str:
+    """Open a resumable upload session and return its session URI."""
+    session = get_session()
+    headers = _auth_headers(access_token)
+    headers["X-Upload-Content-Type"] = mime_type
+    if size is not None:
+        headers["X-Upload-Content-Length"] = str(size)
+    async with session.post(
+        f"{DRIVE_UPLOAD_URL}/files",
+        params={"uploadType": "resumable", "fields": fields},
+        json=metadata,
+        headers=headers,
+    ) as response:
+        await _raise_for_error(response)
+        location = response.headers.get("Location")
+    if not location:
+        raise DriveError(response.status, "Resumable session URI missing")
+    return location
+
+
+def _next_offset(response: aiohttp.ClientResponse) -> int:
+    # Range: bytes=0-N is the last byte Drive has persisted
+    received = response.headers.get("Range")
+    if not received:
+        return 0
+    return int(received.rsplit("-", 1)[1]) + 1
+
+
+@_guarded
+@_rate_limited
+async def upload_chunk(
+    session_uri: str,
+    chunk: bytes | memoryview,
+    offset: int,
+    total: int | None,
+) -> int | dict:
+    """Send one chunk of a resumable upload.
+
+    Returns the next byte offset Drive expects, or the file resource once
+    the final chunk has been accepted. `total` may be None until the last
+    chunk, in which case the size is sent as `*`.
+    """
+    session = get_session()
+    size = "*" if total is None else str(total)
+    if len(chunk):
+        content_range = f"bytes {offset}-{offset + len(chunk) - 1}/{size}"
+    else:
+        content_range = f"bytes */{size}"
+    async with session.put(
+        session_uri,
+        data=chunk,
+        headers={"Content-Range": content_range},
+    ) as response:
+        if response.status == 308:
+            return _next_offset(response)
+        await _raise_for_error(response)
+        body = await response.json()
+    # aiohttp gives None for an empty body; a finished upload must say
+    # which file it made
+    if not isinstance(body, dict):
+        raise DriveError(response.status, "Upload finished without a file resource")
+    return body
+
+
+async def query_upload_status(session_uri: str, total: int | None) -> int | dict:
+    """Ask Drive how much of a resumable upload it has persisted."""
+    return await upload_chunk(session_uri, b"", 0, total)
+
+
+@_guarded
+async def get_user_email(access_token: str) -> str | None:
+    """Email address of the Google account that granted `access_token`.
+
+    None if Google didn't return one; such accounts are never shared.
+    """
+    session = get_session()
+    async with session.get(
+        GOOGLE_USERINFO_URL, headers=_auth_headers(access_token)
+    ) as response:
+        await _raise_for_error(response)
+        body = await response.json()
+    return body.get("email") or None
@@ -0,0 +1,97 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from config import FOLDER_CACHE_REVALIDATE
+from db.queries import (
+    delete_drive_folder,
+    get_drive_folder,
+    save_drive_folder,
+    touch_drive_folder,
+)
+from services.google_drive import find_or_create_folder, is_file_available
+
+ROOT_FOLDER_ID = "root"
+
+type FolderKey = tuple[str, str, str]
+
+# (account_email, parent_id, name) -> (folder_id, monotonic verified time)
+_cache: dict[FolderKey, tuple[str, float]] = {}
+_inflight: dict[FolderKey, asyncio.Task] = {}
+
+
+def split_folder_path(path: str) -> list[str]:
+    """Split 'Books/2026/Sci-Fi' into folder names, ignoring empty segments."""
+    return [name.strip() for name in path.split("/") if name.strip()]
+
+
+def _age(verified_at: datetime) -> float:
+    if verified_at.tzinfo is None:
+        verified_at = verified_at.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - verified_at).total_seconds()
+
+
+async def _resolve_folder(access_token: str, key: FolderKey) -> str:
+    account_email, parent_id, name = key
+
+    cached = await get_drive_folder(account_email, parent_id, name)
+    if cached:
+        folder_id = cached["folder_id"]
+        if _age(cached["verified_at"]) < FOLDER_CACHE_REVALIDATE:
+            return folder_id
+        if await is_file_available(access_token, folder_id):
+            await touch_drive_folder(account_email, folder_id)
+            return folder_id
+        await delete_drive_folder(account_email, folder_id)
+
+    folder_id = await find_or_create_folder(access_token, name, parent_id)
+    return await save_drive_folder(account_email, parent_id, name, folder_id)
+
+
+async def _resolve_segment(
+    access_token: str, account_email: str, parent_id: str, name: str
+) -> str:
+    key = (account_email, parent_id, name)
+    entry = _cache.get(key)
+    if entry is not None and time.monotonic() - entry[1] < FOLDER_CACHE_REVALIDATE:
+        return entry[0]
+
+    # Concurrent resolutions of the same folder share one lookup
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_resolve_folder(access_token, key))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    folder_id = await asyncio.shield(task)
+    _cache[key] = (folder_id, time.monotonic())
+    return folder_id
+
+
+async def resolve_folder_path(
+    access_token: str, account_email: str | None, path: str
+) -> str:
+    """Resolve a folder path to a folder_id, creating missing folders.
+
+    Segments are resolved one by one from the Drive root through an
+    in-memory and a Postgres cache keyed by account, so repeated lookups
+    cost no Drive API calls. Without an account email nothing is cached.
+    """
+    parent_id = ROOT_FOLDER_ID
+    for name in split_folder_path(path):
+        if account_email:
+            parent_id = await _resolve_segment(
+                access_token, account_email, parent_id, name
+            )
+        else:
+            parent_id = await find_or_create_folder(access_token, name, parent_id)
+    return parent_id
+
+
+async def forget_folder(account_email: str | None, folder_id: str) -> None:
+    """Drop a folder that turned out to be trashed or deleted from the caches."""
+    if not account_email:
+        return
+    for key, (cached_id, _) in list(_cache.items()):
+        if key[0] == account_email and folder_id in (cached_id, key[1]):
+            del _cache[key]
+    await delete_drive_folder(account_email, folder_id)
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+from config import GOOGLE_CALL_TIMEOUT, GOOGLE_EXECUTOR_WORKERS
+from services.metrics import EXECUTOR_CALLS, EXECUTOR_TIMEOUTS, register_collector
+
+_executor: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+_queued = 0
+_running = 0
+_timeouts = 0
+
+
+def init_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=GOOGLE_EXECUTOR_WORKERS, thread_name_prefix="google"
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    if _executor is None:
+        raise RuntimeError("Executor not initialized. Call init_executor() first.")
+    return _executor
+
+
+def get_executor_stats() -> dict:
+    """Snapshot of queue depth and worker usage."""
+    with _lock:
+        return {
+            "max_workers": GOOGLE_EXECUTOR_WORKERS,
+            "queued": _queued,
+            "running": _running,
+            "timeouts": _timeouts,
+        }
+
+
+def _call[T](func: Callable[..., T], args: tuple, kwargs: dict) -> T:
+    global _queued, _running
+    with _lock:
+        _queued -= 1
+        _running += 1
+    try:
+        return func(*args, **kwargs)
+    finally:
+        with _lock:
+            _running -= 1
+
+
+def _on_done(future: Future) -> None:
+    global _queued
+    # A future cancelled while still queued never reaches _call
+    if future.cancelled():
+        with _lock:
+            _queued -= 1
+
+
+async def run_blocking[T](
+    func: Callable[..., T],
+    *args: Any,
+    timeout: float | None = GOOGLE_CALL_TIMEOUT,
+    **kwargs: Any,
+) -> T:
+    """Run a blocking Google client call in the thread pool.
+
+    Raises TimeoutError if the call does not finish within `timeout` seconds.
+    A call that already started keeps its worker thread until it returns.
+    """
+    global _queued, _timeouts
+    executor = get_executor()
+    with _lock:
+        _queued += 1
+    try:
+        future = executor.submit(_call, func, args, kwargs)
+    except RuntimeError:
+        with _lock:
+            _queued -= 1
+        raise
+    future.add_done_callback(_on_done)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except TimeoutError:
+        with _lock:
+            _timeouts += 1
+        EXECUTOR_TIMEOUTS.inc()
+        raise
+
+
+def _collect_metrics() -> None:
+    stats = get_executor_stats()
+    EXECUTOR_CALLS.set(stats["queued"], state="queued")
+    EXECUTOR_CALLS.set(stats["running"], state="running")
+
+
+register_collector(_collect_metrics)
@@ -1,8 +1,6 @@
-from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-
+# The Google client libraries (oauthlib, requests, cryptography) take a few
+# hundred milliseconds to import and are only needed for /connect and token
+# refreshes, so they are imported on first use to keep startup fast
 from config import (
     GOOGLE_CLIENT_ID,
     GOOGLE_CLIENT_SECRET,
@@ -24,6 +22,8 @@ def _get_client_config() -> dict:
 
 
 def generate_auth_url(state: str) -> str:
+    from google_auth_oauthlib.flow import Flow
+
     flow = Flow.from_client_config(
         _get_client_config(),
         scopes=GOOGLE_SCOPES,
@@ -39,6 +39,8 @@ def generate_auth_url(state: str) -> str:
 
 
 def exchange_code(code: str) -> dict:
+    from google_auth_oauthlib.flow import Flow
+
     flow = Flow.from_client_config(
         _get_client_config(),
         scopes=GOOGLE_SCOPES,
@@ -54,6 +56,9 @@ def exchange_code(code: str) -> dict:
 
 
 def refresh_access_token(refresh_token: str) -> dict:
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+
     credentials = Credentials(
         token=None,
         refresh_token=refresh_token,
@@ -66,10 +71,3 @@ def refresh_access_token(refresh_token: str) -> dict:
         "access_token": credentials.token,
         "expires_at": credentials.expiry,
     }
-
-
-def get_user_email(access_token: str) -> str:
-    credentials = Credentials(token=access_token)
-    service = build("oauth2", "v2", credentials=credentials)
-    user_info = service.userinfo().get().execute()
-    return user_info.get("email", "")
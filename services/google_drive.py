@@ -1,22 +1,39 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
 from datetime import datetime, timedelta, timezone
 from io import BytesIO
 
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
+from config import (
+    DRIVE_CHUNK_RETRIES,
+    DRIVE_CHUNK_SIZE,
+    DRIVE_CHUNK_TARGET_SECONDS,
+    DRIVE_MAX_CHUNK_SIZE,
+    DRIVE_MIN_CHUNK_SIZE,
+    STREAM_MAX_CHUNK_SIZE,
+)
+from services.drive_client import (
+    DriveError,
+    create_file,
+    get_file,
+    is_transient,
+    list_files,
+    query_upload_status,
+    start_resumable_upload,
+    upload_chunk,
+)
 
-from config import GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+UPLOAD_FIELDS = "id,webViewLink,md5Checksum"
+# Drive requires every chunk but the last to be a multiple of this
+CHUNK_GRANULARITY = 256 * 1024
 
-
-def create_credentials(access_token: str, refresh_token: str) -> Credentials:
-    """Create Google Credentials object from tokens."""
-    return Credentials(
-        token=access_token,
-        refresh_token=refresh_token,
-        token_uri="https://oauth2.googleapis.com/token",
-        client_id=GOOGLE_CLIENT_ID,
-        client_secret=GOOGLE_CLIENT_SECRET,
-    )
+type ProgressCallback = Callable[[int, int], Awaitable[None]]
+# Called with the session URI and confirmed offset whenever they change
+type CheckpointCallback = Callable[[str, int], Awaitable[None]]
 
 
 def is_token_expired(expires_at: datetime | None) -> bool:
@@ -29,43 +46,317 @@ def is_token_expired(expires_at: datetime | None) -> bool:
     return now >= expires_at - timedelta(minutes=5)
 
 
-def find_or_create_folder(credentials: Credentials, folder_name: str) -> str:
-    """Find existing folder by name or create a new one. Returns folder_id."""
-    service = build("drive", "v3", credentials=credentials)
+def _escape_query(value: str) -> str:
+    """Escape a string literal for a Drive `q` expression."""
+    return value.replace("\\", "\\\\").replace("'", "\\'")
 
-    # Search for existing folder
-    query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-    results = service.files().list(q=query, fields="files(id)").execute()
 
-    if results.get("files"):
-        return results["files"][0]["id"]
+def _with_link(file: dict) -> dict:
+    link = (
+        file.get("webViewLink") or f"https://drive.google.com/file/d/{file['id']}/view"
+    )
+    return {**file, "webViewLink": link}
+
+
+async def find_or_create_folder(
+    access_token: str, folder_name: str, parent_id: str = "root"
+) -> str:
+    """Find a folder by name under `parent_id` or create it. Returns folder_id."""
+    # Search for existing folder
+    query = (
+        f"name='{_escape_query(folder_name)}' and mimeType='{FOLDER_MIME_TYPE}' "
+        f"and '{_escape_query(parent_id)}' in parents and trashed=false"
+    )
+    files = await list_files(access_token, query, "files(id)")
+    if files:
+        return files[0]["id"]
 
     # Create folder if not found
-    metadata = {"name": folder_name, "mimeType": "application/vnd.google-apps.folder"}
-    folder = service.files().create(body=metadata, fields="id").execute()
+    metadata = {
+        "name": folder_name,
+        "mimeType": FOLDER_MIME_TYPE,
+        "parents": [parent_id],
+    }
+    folder = await create_file(access_token, metadata, "id")
     return folder["id"]
 
 
-def upload_file(
-    credentials: Credentials,
-    file_content: BytesIO,
-    file_name: str,
+async def is_file_available(access_token: str, file_id: str) -> bool:
+    """Check that a file or folder still exists and is not in the trash."""
+    try:
+        file = await get_file(access_token, file_id, "id,trashed")
+    except DriveError as e:
+        if e.status == 404:
+            return False
+        raise
+    return not file.get("trashed", False)
+
+
+class ChunkSizer:
+    """Size upload chunks so each takes about `target` seconds to send.
+
+    Fast links get large chunks (fewer round trips), slow or flaky links
+    get small ones, so a failed chunk wastes little and progress is
+    checkpointed often.
+    """
+
+    def __init__(
+        self,
+        initial: int = DRIVE_CHUNK_SIZE,
+        minimum: int = DRIVE_MIN_CHUNK_SIZE,
+        maximum: int = DRIVE_MAX_CHUNK_SIZE,
+        target: float = DRIVE_CHUNK_TARGET_SECONDS,
+    ):
+        self.minimum = max(CHUNK_GRANULARITY, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.target = target
+        self.size = self._clamp(initial)
+        self._rate: float | None = None  # bytes per second, smoothed
+
+    def _clamp(self, size: int) -> int:
+        size = max(self.minimum, min(self.maximum, size))
+        return size - size % CHUNK_GRANULARITY
+
+    def record(self, sent: int, seconds: float) -> None:
+        """Account for a chunk of `sent` bytes that took `seconds`."""
+        if sent < CHUNK_GRANULARITY or seconds <= 0:
+            return  # Tiny final chunks say more about latency than bandwidth
+        rate = sent / seconds
+        self._rate = rate if self._rate is None else 0.7 * self._rate + 0.3 * rate
+        # Grow at most 2x per chunk so one lucky chunk can't overshoot
+        self.size = self._clamp(min(int(self._rate * self.target), self.size * 2))
+
+
+async def _open_session(
+    access_token: str,
+    metadata: dict,
     mime_type: str,
-    folder_id: str | None = None,
-) -> str:
-    """Upload file to Google Drive and return the shareable link."""
-    service = build("drive", "v3", credentials=credentials)
+    total: int | None,
+    session_uri: str | None,
+) -> tuple[str, int | dict]:
+    """Resume `session_uri` if Drive still has it, or start a new session.
+
+    Returns the session URI and the offset to continue from, or the file
+    resource if the previous attempt already finished the upload.
+    """
+    if session_uri:
+        try:
+            return session_uri, await query_upload_status(session_uri, total)
+        except DriveError as e:
+            # Sessions expire after a week; anything else is a real error
+            if e.status not in (404, 410):
+                raise
+            logging.info("Upload session expired, starting over")
+    session_uri = await start_resumable_upload(
+        access_token, metadata, mime_type, total, UPLOAD_FIELDS
+    )
+    return session_uri, 0
+
+
+async def _send_chunk(
+    session_uri: str,
+    chunk: bytes | memoryview,
+    offset: int,
+    total: int | None,
+    sizer: ChunkSizer,
+) -> int | dict:
+    """Send a chunk, recovering from network errors through the session.
+
+    After a transient failure Drive is asked how much it persisted, so the
+    caller continues from there rather than resending the whole file.
+    Returns an offset past `offset`, or the finished file resource.
+    """
+    attempt = 0
+    while True:
+        started = time.monotonic()
+        try:
+            result = await upload_chunk(session_uri, chunk, offset, total)
+        except Exception as e:
+            attempt += 1
+            if attempt > DRIVE_CHUNK_RETRIES or not is_transient(e):
+                raise
+            logging.warning("Chunk at byte %s failed, resuming: %r", offset, e)
+        else:
+            sizer.record(len(chunk), time.monotonic() - started)
+            if isinstance(result, int) and result <= offset:
+                raise DriveError(308, f"Upload made no progress at byte {offset}")
+            return result
+
+        await asyncio.sleep(min(2**attempt, 30) * random.uniform(0.5, 1.0))
+        try:
+            result = await query_upload_status(session_uri, total)
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            continue
+        if isinstance(result, dict) or result > offset:
+            return result
+
 
+def _metadata(file_name: str, folder_id: str | None) -> dict:
     file_metadata: dict[str, str | list[str]] = {"name": file_name}
     if folder_id:
         file_metadata["parents"] = [folder_id]
+    return file_metadata
 
-    media = MediaIoBaseUpload(file_content, mimetype=mime_type, resumable=True)
 
-    file = (
-        service.files()
-        .create(body=file_metadata, media_body=media, fields="id,webViewLink")
-        .execute()
+async def upload_file(
+    access_token: str,
+    file_content: BytesIO,
+    file_name: str,
+    mime_type: str,
+    folder_id: str | None = None,
+    session_uri: str | None = None,
+    checkpoint: CheckpointCallback | None = None,
+) -> dict:
+    """Upload file to Google Drive.
+
+    Returns the file resource with id, webViewLink and md5Checksum.
+
+    Pass the `session_uri` saved by `checkpoint` to resume an earlier
+    attempt; an expired session starts over.
+    """
+    data = file_content.getbuffer()
+    total = len(data)
+    session_uri, status = await _open_session(
+        access_token, _metadata(file_name, folder_id), mime_type, total, session_uri
     )
 
-    return file.get("webViewLink", f"https://drive.google.com/file/d/{file['id']}/view")
+    sizer = ChunkSizer()
+    while isinstance(status, int):
+        offset = status
+        if checkpoint:
+            await checkpoint(session_uri, offset)
+        chunk = data[offset : offset + sizer.size]
+        status = await _send_chunk(session_uri, chunk, offset, total, sizer)
+    return _with_link(status)
+
+
+async def upload_local_file(
+    access_token: str,
+    path: str,
+    file_name: str,
+    mime_type: str,
+    folder_id: str | None = None,
+    session_uri: str | None = None,
+    checkpoint: CheckpointCallback | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> dict:
+    """Upload a file from local disk to Google Drive.
+
+    Returns the file resource with id, webViewLink and md5Checksum.
+
+    Chunks are read with pread into two reused buffers, the next one while
+    the current one is sent, so memory stays at two chunks per upload.
+    `on_progress(sent, total)` is awaited after every confirmed chunk.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    buffers = [bytearray(), bytearray()]
+    pending: asyncio.Future[int] | None = None
+
+    def read_at(index: int, offset: int, size: int) -> asyncio.Future[int]:
+        if len(buffers[index]) < size:
+            buffers[index] = bytearray(size)
+        view = memoryview(buffers[index])[:size]
+        return asyncio.ensure_future(asyncio.to_thread(os.preadv, fd, [view], offset))
+
+    try:
+        total = os.fstat(fd).st_size
+        session_uri, status = await _open_session(
+            access_token, _metadata(file_name, folder_id), mime_type, total, session_uri
+        )
+        if isinstance(status, dict):
+            return _with_link(status)
+
+        sizer = ChunkSizer()
+        current = 0
+        offset = status
+        pending = read_at(current, offset, sizer.size)
+        while True:
+            if checkpoint:
+                await checkpoint(session_uri, offset)
+            size = await pending
+            pending = None
+            end = offset + size
+            if end < total:
+                pending = read_at(1 - current, end, sizer.size)
+
+            chunk = memoryview(buffers[current])[:size]
+            result = await _send_chunk(session_uri, chunk, offset, total, sizer)
+            if isinstance(result, dict):
+                return _with_link(result)
+            if result != end:
+                # Drive kept part of the chunk; resume reading from its offset
+                if pending:
+                    await pending
+                pending = read_at(1 - current, result, sizer.size)
+            offset = result
+            current = 1 - current
+            if on_progress:
+                await on_progress(offset, total)
+    finally:
+        # A read still in flight must not outlive the descriptor
+        if pending:
+            await asyncio.gather(pending, return_exceptions=True)
+        os.close(fd)
+
+
+async def upload_stream(
+    access_token: str,
+    chunks: AsyncIterator[bytes],
+    file_name: str,
+    mime_type: str,
+    folder_id: str | None = None,
+    chunk_size: int = DRIVE_CHUNK_SIZE,
+    max_chunk_size: int = STREAM_MAX_CHUNK_SIZE,
+    session_uri: str | None = None,
+    checkpoint: CheckpointCallback | None = None,
+) -> dict:
+    """Upload an async stream of bytes to Google Drive.
+
+    Returns the file resource with id, webViewLink and md5Checksum.
+
+    At most one chunk (plus one incoming piece) is buffered, so memory use
+    does not depend on the file size. Chunks start at `chunk_size` and
+    grow on fast links up to `max_chunk_size`. When resuming, the part of
+    the stream Drive already has is read and dropped.
+    """
+    session_uri, status = await _open_session(
+        access_token, _metadata(file_name, folder_id), mime_type, None, session_uri
+    )
+    if isinstance(status, dict):
+        return _with_link(status)
+
+    sizer = ChunkSizer(chunk_size, maximum=max_chunk_size)
+    offset = skip = status
+    if checkpoint:
+        await checkpoint(session_uri, offset)
+    buffer = bytearray()
+    async for piece in chunks:
+        if skip:
+            if len(piece) <= skip:
+                skip -= len(piece)
+                continue
+            piece, skip = piece[skip:], 0
+        buffer += piece
+        while len(buffer) >= sizer.size:
+            result = await _send_chunk(
+                session_uri, bytes(buffer[: sizer.size]), offset, None, sizer
+            )
+            if isinstance(result, dict):
+                raise DriveError(200, "Upload finished before the stream ended")
+            del buffer[: result - offset]
+            offset = result
+            if checkpoint:
+                await checkpoint(session_uri, offset)
+    if skip:
+        raise DriveError(400, "Stream ended before the resumed upload offset")
+
+    # Last chunk carries the total size, which is only known now
+    total = offset + len(buffer)
+    while True:
+        result = await _send_chunk(session_uri, bytes(buffer), offset, total, sizer)
+        if isinstance(result, dict):
+            return _with_link(result)
+        del buffer[: result - offset]
+        offset = result
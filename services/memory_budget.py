@@ -0,0 +1,102 @@
+import asyncio
+from collections import deque
+
+from config import UPLOAD_MEMORY_BUDGET
+from services.metrics import UPLOAD_MEMORY, register_collector
+
+
+class ByteBudget:
+    """Semaphore counted in bytes: at most `capacity` are reserved at once.
+
+    A request that fits may go ahead of an older one that is waiting for
+    more room, so small files are not held up behind a large one. Once a
+    full `capacity` of bytes has gone ahead of the oldest waiter, requests
+    are served in order until it gets its turn, so it can't be starved.
+    A reservation larger than the whole budget is cut down to `capacity`,
+    i.e. it runs alone.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.available = capacity
+        self._waiters: deque[tuple[int, asyncio.Future]] = deque()
+        # Bytes granted ahead of the oldest waiter since it became the oldest
+        self._overtaken = 0
+
+    @property
+    def reserved(self) -> int:
+        return self.capacity - self.available
+
+    @property
+    def waiting(self) -> int:
+        """Bytes requested by reservations that are waiting."""
+        return sum(size for size, future in self._waiters if not future.done())
+
+    def would_wait(self, size: int) -> bool:
+        """Whether reserving `size` bytes now would have to wait."""
+        size = min(size, self.capacity)
+        if size > self.available:
+            return True
+        return bool(self._waiters) and self._overtaken + size > self.capacity
+
+    async def acquire(self, size: int) -> int:
+        """Reserve `size` bytes once they fit; returns the amount for `release`."""
+        size = min(size, self.capacity)
+        if not self.would_wait(size):
+            self._grant(size)
+            return size
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((size, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the waiter was cancelled
+                self.release(size)
+            else:
+                # Waiters behind this one may fit now
+                self._wake()
+            raise
+        return size
+
+    def release(self, size: int) -> None:
+        self.available += size
+        self._wake()
+
+    def _grant(self, size: int) -> None:
+        self.available -= size
+        if self._waiters:
+            self._overtaken += size
+
+    def _wake(self) -> None:
+        # The oldest waiters first, for as long as they fit
+        while self._waiters:
+            size, future = self._waiters[0]
+            if not future.done():
+                if size > self.available:
+                    break
+                self.available -= size
+                future.set_result(None)
+            self._waiters.popleft()
+            self._overtaken = 0
+        # Then younger ones that fit, up to the limit on overtaking
+        for entry in list(self._waiters)[1:]:
+            size, future = entry
+            if future.done() or self.would_wait(size):
+                continue
+            self._waiters.remove(entry)
+            self._grant(size)
+            future.set_result(None)
+
+
+# Bytes held by transfers in this process (download buffers, Drive chunks)
+upload_memory = ByteBudget(UPLOAD_MEMORY_BUDGET)
+
+
+def _collect_metrics() -> None:
+    UPLOAD_MEMORY.set(upload_memory.reserved, state="reserved")
+    UPLOAD_MEMORY.set(upload_memory.available, state="available")
+    UPLOAD_MEMORY.set(upload_memory.waiting, state="waiting")
+
+
+register_collector(_collect_metrics)
@@ -0,0 +1,282 @@
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+
+from aiohttp import web
+
+from config import METRICS_HOST, METRICS_PORT
+
+try:
+    from opentelemetry import trace
+except ImportError:  # Tracing is optional
+    trace = None
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+type Labels = tuple[str, ...]
+
+_metrics: list["_Metric"] = []
+_collectors: list[Callable[[], None]] = []
+# name -> check returning (ready, details) for /health and /ready
+_health_checks: dict[str, Callable[[], tuple[bool, dict]]] = {}
+_runner: web.AppRunner | None = None
+_tracer = trace.get_tracer("tg2gd") if trace else None
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    kind: str
+
+    def __init__(self, name: str, help: str, labels: Labels = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        _metrics.append(self)
+
+    def _key(self, labels: dict[str, str]) -> Labels:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    @abstractmethod
+    def samples(self) -> list[str]:
+        """Exposition lines for the current values."""
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Labels = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Labels = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = (*sorted(buckets), math.inf)
+        # Per label set: bucket counts (non-cumulative), sum
+        self._values: dict[Labels, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        if key not in self._values:
+            self._values[key] = ([0] * len(self.buckets), [0.0])
+        counts, total = self._values[key]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        total[0] += value
+
+    def samples(self) -> list[str]:
+        lines = []
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labels, key, le)} "
+                    f"{cumulative}"
+                )
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def register_collector(collect: Callable[[], None]) -> None:
+    """Run `collect` before every scrape, e.g. to set gauges from a snapshot."""
+    _collectors.append(collect)
+
+
+def register_health_check(name: str, check: Callable[[], tuple[bool, dict]]) -> None:
+    """Include `check` in /health; the process is ready if all checks are."""
+    _health_checks[name] = check
+
+
+def health() -> tuple[bool, dict]:
+    """Whether this process is ready for traffic, and every check's details."""
+    ready = True
+    checks = {}
+    for name, check in _health_checks.items():
+        try:
+            ok, details = check()
+        except Exception:
+            logging.exception("Health check %s failed", name)
+            ok, details = False, {}
+        ready = ready and ok
+        checks[name] = {"ready": ok, **details}
+    return ready, {"ready": ready, "checks": checks}
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    for collect in _collectors:
+        try:
+            collect()
+        except Exception:
+            logging.exception("Metrics collector failed")
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Upload pipeline
+STAGE_SECONDS = Histogram(
+    "upload_stage_seconds", "Time spent in each upload stage", ("stage",)
+)
+JOB_SECONDS = Histogram(
+    "upload_job_seconds", "Time from claiming a job to its outcome", ("result",)
+)
+JOBS = Counter("upload_jobs_total", "Finished upload attempts by outcome", ("result",))
+UPLOADED_BYTES = Counter(
+    "upload_bytes_total", "Bytes copied to Google Drive", ("source",)
+)
+IN_FLIGHT = Gauge("uploads_in_flight", "Upload jobs currently running")
+ERRORS = Counter("upload_errors_total", "Failed upload attempts by cause", ("error",))
+TOKEN_REFRESHES = Counter(
+    "token_refreshes_total", "Access token refreshes by outcome", ("result",)
+)
+UPLOAD_MEMORY = Gauge(
+    "upload_memory_bytes",
+    "Upload memory budget in bytes: reserved, available, waiting",
+    ("state",),
+)
+
+DRIVE_RATE_LIMITED = Counter(
+    "drive_rate_limited_total", "Drive quota errors (429/403) that were backed off"
+)
+
+# Circuit breakers around Drive, token refresh and Postgres
+BREAKER_STATE = Gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ("name",),
+)
+BREAKER_REJECTED = Counter(
+    "circuit_breaker_rejected_total",
+    "Calls failed fast because the circuit was open",
+    ("name",),
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "Database pool connections by state", ("state",)
+)
+
+# Thread pool for blocking Google calls
+EXECUTOR_CALLS = Gauge(
+    "google_executor_calls", "Blocking Google calls by state", ("state",)
+)
+EXECUTOR_TIMEOUTS = Counter(
+    "google_executor_timeouts_total", "Blocking Google calls that timed out"
+)
+
+
+@asynccontextmanager
+async def stage(name: str) -> AsyncIterator[None]:
+    """Time a stage of the upload pipeline, in a tracing span if available."""
+    started = time.perf_counter()
+    try:
+        if _tracer:
+            with _tracer.start_as_current_span(name):
+                yield
+        else:
+            yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=name)
+
+
+async def _handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+
+async def _handle_health(request: web.Request) -> web.Response:
+    # Liveness: the event loop answers; details are informational
+    return web.json_response(health()[1])
+
+
+async def _handle_ready(request: web.Request) -> web.Response:
+    ready, body = health()
+    return web.json_response(body, status=200 if ready else 503)
+
+
+async def start_metrics_server(port: int = METRICS_PORT) -> None:
+    """Serve /metrics, /health and /ready on `port`; a port of 0 disables them."""
+    global _runner
+    if not port or _runner is not None:
+        return
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    app.router.add_get("/health", _handle_health)
+    app.router.add_get("/ready", _handle_ready)
+    _runner = web.AppRunner(app, access_log=None)
+    await _runner.setup()
+    await web.TCPSite(_runner, METRICS_HOST, port).start()
+    logging.info("Metrics available on %s:%s/metrics", METRICS_HOST, port)
+
+
+async def stop_metrics_server() -> None:
+    global _runner
+    if _runner is not None:
+        await _runner.cleanup()
+        _runner = None
@@ -0,0 +1,23 @@
+import logging
+
+from config import OAUTH_STATE_PURGE_BATCH_SIZE, OAUTH_STATE_TTL
+from db.queries import purge_oauth_states
+
+
+async def purge_stale_oauth_states() -> int:
+    """Delete /connect states older than OAUTH_STATE_TTL.
+
+    Runs in batches so a large backlog doesn't hold locks or bloat WAL in
+    one transaction. Returns the number of states deleted.
+    """
+    purged = 0
+    while True:
+        deleted = await purge_oauth_states(
+            OAUTH_STATE_TTL, OAUTH_STATE_PURGE_BATCH_SIZE
+        )
+        purged += deleted
+        if deleted < OAUTH_STATE_PURGE_BATCH_SIZE:
+            break
+    if purged:
+        logging.info("Purged %s stale OAuth states", purged)
+    return purged
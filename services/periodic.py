@@ -0,0 +1,28 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+
+_tasks: list[asyncio.Task] = []
+
+
+async def _run(name: str, func: Callable[[], Awaitable[object]], interval: float):
+    while True:
+        try:
+            await func()
+        except Exception:
+            logging.exception("Periodic task %s failed", name)
+        await asyncio.sleep(interval)
+
+
+def start_periodic(
+    name: str, func: Callable[[], Awaitable[object]], interval: float
+) -> None:
+    """Run `func` every `interval` seconds until stop_periodic()."""
+    _tasks.append(asyncio.create_task(_run(name, func, interval), name=name))
+
+
+async def stop_periodic() -> None:
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
@@ -0,0 +1,87 @@
+import asyncio
+import random
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from config import (
+    DRIVE_ACCOUNT_BURST,
+    DRIVE_ACCOUNT_RATE,
+    DRIVE_BACKOFF_BASE,
+    DRIVE_BACKOFF_MAX,
+)
+
+# Google account the current task is making Drive calls for
+_account: ContextVar[str | None] = ContextVar("drive_account", default=None)
+_buckets: dict[str, "TokenBucket"] = {}
+
+
+class TokenBucket:
+    """Allow `rate` requests per second on average, in bursts up to `capacity`.
+
+    Waiters are served in arrival order. `pause` stops the bucket for a
+    while, e.g. after the server reported a quota error.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        self._paused_until = max(self._paused_until, now + seconds)
+        # Come back at the sustained rate rather than with a full burst
+        self._tokens = 0
+
+
+@contextmanager
+def drive_account(email: str | None) -> Iterator[None]:
+    """Attribute Drive calls made inside the block to `email`'s quota."""
+    token = _account.set(email)
+    try:
+        yield
+    finally:
+        _account.reset(token)
+
+
+def current_bucket() -> TokenBucket | None:
+    """The rate limiter of the account set by `drive_account`, if any."""
+    email = _account.get()
+    if not email:
+        return None
+    bucket = _buckets.get(email)
+    if bucket is None:
+        bucket = _buckets[email] = TokenBucket(DRIVE_ACCOUNT_RATE, DRIVE_ACCOUNT_BURST)
+    return bucket
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None) -> float:
+    """Jittered exponential backoff, at least the server's Retry-After."""
+    delay = min(DRIVE_BACKOFF_BASE * 2**attempt, DRIVE_BACKOFF_MAX)
+    delay = random.uniform(delay / 2, delay)
+    return max(delay, retry_after or 0)
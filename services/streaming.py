@@ -0,0 +1,64 @@
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import suppress
+
+from aiogram import Bot
+
+from config import STREAM_READ_CHUNK_SIZE, TELEGRAM_DOWNLOAD_TIMEOUT
+
+_END = object()
+
+
+class DownloadError(Exception):
+    """Reading the file from Telegram failed."""
+
+
+async def stream_telegram_file(
+    bot: Bot, file_path: str, chunk_size: int = STREAM_READ_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """Yield a Telegram file in chunks as they arrive from the file endpoint."""
+    url = bot.session.api.file_url(bot.token, file_path)
+    try:
+        async for chunk in bot.session.stream_content(
+            url=url,
+            timeout=TELEGRAM_DOWNLOAD_TIMEOUT,
+            chunk_size=chunk_size,
+            raise_for_status=True,
+        ):
+            yield chunk
+    except Exception as e:
+        raise DownloadError(f"Failed to read {file_path} from Telegram") from e
+
+
+async def prefetch(
+    source: AsyncIterator[bytes], max_chunks: int
+) -> AsyncIterator[bytes]:
+    """Read ahead from `source` into a bounded queue.
+
+    The producer keeps reading while the consumer is busy, so download and
+    upload overlap, but never holds more than `max_chunks` chunks.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_chunks)
+
+    async def produce() -> None:
+        try:
+            async for chunk in source:
+                await queue.put(chunk)
+        except Exception as e:
+            await queue.put(e)
+        else:
+            await queue.put(_END)
+
+    task = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
@@ -0,0 +1,44 @@
+import asyncio
+import logging
+
+from google.auth.exceptions import RefreshError
+
+from config import (
+    TOKEN_REFRESH_BATCH_SIZE,
+    TOKEN_REFRESH_CONCURRENCY,
+    TOKEN_REFRESH_LEAD,
+)
+from db.queries import get_expiring_google_accounts
+from services.token_store import refresh_account
+
+
+async def refresh_expiring_tokens() -> int:
+    """Refresh tokens that expire within TOKEN_REFRESH_LEAD seconds.
+
+    Each Google account is refreshed once for all its chats and topics.
+    Returns the number of accounts refreshed. Rejected refresh tokens are
+    flagged on their account by the token store.
+    """
+    accounts = await get_expiring_google_accounts(
+        TOKEN_REFRESH_LEAD, TOKEN_REFRESH_BATCH_SIZE
+    )
+    semaphore = asyncio.Semaphore(TOKEN_REFRESH_CONCURRENCY)
+
+    async def refresh(account: dict) -> bool:
+        name = account["email"] or f"account {account['account_id']}"
+        async with semaphore:
+            try:
+                await refresh_account(account)
+            except RefreshError as e:
+                logging.warning("Token refresh rejected for %s: %s", name, e)
+                return False
+            except Exception:
+                logging.exception("Token refresh failed for %s", name)
+                return False
+        return True
+
+    results = await asyncio.gather(*(refresh(account) for account in accounts))
+    refreshed = sum(results)
+    if accounts:
+        logging.info("Refreshed %s of %s expiring tokens", refreshed, len(accounts))
+    return refreshed
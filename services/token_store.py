@@ -0,0 +1,241 @@
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from datetime import datetime, timedelta, timezone
+
+from google.auth.exceptions import RefreshError
+
+from config import TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL
+from db.queries import (
+    get_google_account,
+    get_oauth_token,
+    mark_google_account_refresh_failed,
+    update_google_account_token,
+)
+from services.circuit_breaker import CircuitBreaker
+from services.executor import run_blocking
+from services.metrics import TOKEN_REFRESHES, stage
+from services.google_auth import refresh_access_token
+from services.google_drive import is_token_expired
+
+type TokenKey = tuple[int, int, int | None]
+
+# Fields of a token that belong to the Google account and are shared by all
+# chats/topics connected to it; the folder is per connection
+_ACCOUNT_FIELDS = (
+    "account_id",
+    "email",
+    "access_token",
+    "refresh_token",
+    "expires_at",
+    "refresh_failed_at",
+    "refresh_error",
+)
+
+# key -> (binding, monotonic deadline), least recently used first
+_bindings: OrderedDict[TokenKey, tuple[dict, float]] = OrderedDict()
+# account id -> (credentials, monotonic deadline), least recently used first
+_accounts: OrderedDict[int, tuple[dict, float]] = OrderedDict()
+_inflight: dict[tuple[str, Hashable], asyncio.Task] = {}
+# Opens when Google's token endpoint fails, not when it rejects a token
+_refresh_breaker = CircuitBreaker(
+    "token_refresh",
+    "Google sign-in",
+    lambda e: not isinstance(e, RefreshError) or getattr(e, "retryable", False),
+)
+# Bumped on every invalidation so loads that started earlier don't cache
+_generation = 0
+
+
+def _ttl(account: dict) -> float:
+    """Seconds the account may stay cached: until it enters the refresh window."""
+    if account.get("refresh_failed_at") is not None:
+        # Reconnecting clears the flag; look for that in the database
+        return 0
+    expires_at = account.get("expires_at")
+    if expires_at is None:
+        return 0
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    remaining = expires_at - timedelta(minutes=5) - datetime.now(timezone.utc)
+    return min(remaining.total_seconds(), TOKEN_CACHE_TTL)
+
+
+def _cached[K](cache: OrderedDict[K, tuple[dict, float]], key: K) -> dict | None:
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    value, deadline = entry
+    if time.monotonic() >= deadline:
+        del cache[key]
+        return None
+    cache.move_to_end(key)
+    return value
+
+
+def _put[K](
+    cache: OrderedDict[K, tuple[dict, float]], key: K, value: dict, ttl: float
+) -> None:
+    if ttl <= 0:
+        return
+    cache[key] = (value, time.monotonic() + ttl)
+    cache.move_to_end(key)
+    while len(cache) > TOKEN_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def _get_cached(key: TokenKey) -> dict | None:
+    binding = _cached(_bindings, key)
+    if binding is None:
+        return None
+    account = _cached(_accounts, binding["account_id"])
+    if account is None:
+        return None
+    return {**binding, **account}
+
+
+def _store_account(account: dict, generation: int) -> None:
+    if generation == _generation:
+        _put(_accounts, account["account_id"], account, _ttl(account))
+
+
+def _store(key: TokenKey, token: dict, generation: int) -> None:
+    if generation != _generation:
+        return
+    account = {field: token[field] for field in _ACCOUNT_FIELDS}
+    binding = {k: v for k, v in token.items() if k not in _ACCOUNT_FIELDS}
+    binding["account_id"] = token["account_id"]
+    _put(_bindings, key, binding, TOKEN_CACHE_TTL)
+    _store_account(account, generation)
+
+
+async def _refresh(account: dict) -> dict:
+    """Exchange the refresh token for a new access token and persist it.
+
+    A refresh token Google has rejected is flagged on the account so later
+    uploads fail fast instead of retrying the exchange.
+    """
+    if account.get("refresh_failed_at") is not None:
+        raise RefreshError(
+            f"Refresh token was rejected: {account.get('refresh_error')}"
+        )
+    # Another process may have refreshed (or reconnected) it since it was read
+    current = await get_google_account(account["account_id"])
+    if current is None:
+        raise RefreshError("Google account was disconnected")
+    if current["access_token"] != account["access_token"]:
+        return current
+    try:
+        async with stage("refresh"), _refresh_breaker.guard():
+            refreshed = await run_blocking(
+                refresh_access_token, current["refresh_token"]
+            )
+    except RefreshError as e:
+        if not getattr(e, "retryable", False):
+            TOKEN_REFRESHES.inc(result="revoked")
+            await mark_google_account_refresh_failed(current["account_id"], str(e))
+            _drop_account(current["account_id"])
+        else:
+            TOKEN_REFRESHES.inc(result="error")
+        raise
+    except Exception:
+        TOKEN_REFRESHES.inc(result="error")
+        raise
+    TOKEN_REFRESHES.inc(result="ok")
+    await update_google_account_token(
+        current["account_id"], refreshed["access_token"], refreshed["expires_at"]
+    )
+    return {
+        **current,
+        "access_token": refreshed["access_token"],
+        "expires_at": refreshed["expires_at"],
+    }
+
+
+async def _single_flight[T](
+    kind: str, key: Hashable, load: Callable[[], Awaitable[T]]
+) -> T:
+    """Run `load` once per key; concurrent callers share its result."""
+    task = _inflight.get((kind, key))
+    if task is None:
+        task = asyncio.create_task(load())
+        _inflight[(kind, key)] = task
+        task.add_done_callback(lambda _: _inflight.pop((kind, key), None))
+    return await asyncio.shield(task)
+
+
+async def get_token(user_id: int, chat_id: int, topic_id: int | None) -> dict | None:
+    """Cached get_oauth_token. The access token may be expired."""
+    key = (user_id, chat_id, topic_id)
+    token = _get_cached(key)
+    if token is not None:
+        return token
+
+    async def load() -> dict | None:
+        generation = _generation
+        token = await get_oauth_token(*key)
+        if token is not None:
+            _store(key, token, generation)
+        return token
+
+    return await _single_flight("load", key, load)
+
+
+async def get_valid_token(
+    user_id: int, chat_id: int, topic_id: int | None
+) -> dict | None:
+    """Return the token with a usable access token, refreshing if needed.
+
+    Concurrent callers for the same key share one DB read, and all chats
+    and topics of a Google account share at most one refresh. Raises
+    RefreshError if Google rejects the refresh token.
+    """
+    key = (user_id, chat_id, topic_id)
+    token = _get_cached(key)
+    if token is not None:
+        return token
+
+    async def load() -> dict | None:
+        generation = _generation
+        token = await get_oauth_token(*key)
+        if token is None:
+            return None
+        if is_token_expired(token.get("expires_at")):
+            token = {**token, **await refresh_account(token)}
+        _store(key, token, generation)
+        return token
+
+    return await _single_flight("valid", key, load)
+
+
+async def refresh_account(account: dict) -> dict:
+    """Refresh an account's access token now, e.g. ahead of its expiry.
+
+    `account` needs the fields of get_google_account; a token from
+    get_oauth_token has them. The new token is cached for every chat and
+    topic connected to the account.
+    """
+
+    async def load() -> dict:
+        generation = _generation
+        refreshed = await _refresh(account)
+        _store_account(refreshed, generation)
+        return refreshed
+
+    return await _single_flight("refresh", account["account_id"], load)
+
+
+def _drop_account(account_id: int) -> None:
+    global _generation
+    _generation += 1
+    _accounts.pop(account_id, None)
+
+
+def invalidate_token(user_id: int, chat_id: int, topic_id: int | None) -> None:
+    """Drop a cached token after it was saved, changed or deleted."""
+    global _generation
+    _generation += 1
+    entry = _bindings.pop((user_id, chat_id, topic_id), None)
+    if entry is not None:
+        _drop_account(entry[0]["account_id"])
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timezone
+
+from config import HISTORY_BATCH_SIZE, HISTORY_FLUSH_INTERVAL, HISTORY_MAX_PENDING
+from db.connection import is_outage
+from db.queries import insert_upload_history
+from services.circuit_breaker import CircuitOpenError
+
+# Rows waiting to be written, oldest first; the oldest are dropped when full
+_pending: deque[dict] = deque(maxlen=HISTORY_MAX_PENDING)
+_wakeup = asyncio.Event()
+_task: asyncio.Task | None = None
+_stopping = False
+
+
+def record_upload(
+    job: dict,
+    outcome: str,
+    duration: float,
+    drive_file: dict | None = None,
+    error: str | None = None,
+) -> None:
+    """Queue a finished job for the uploads table without waiting for it."""
+    if len(_pending) == HISTORY_MAX_PENDING:
+        logging.warning("Upload history backlog full, dropping the oldest entry")
+    _pending.append(
+        {
+            "job_id": job["id"],
+            "user_id": job["user_id"],
+            "chat_id": job["chat_id"],
+            "topic_id": job["topic_id"],
+            "file_name": job["file_name"],
+            "mime_type": job["mime_type"],
+            "file_size": job["file_size"],
+            "drive_file_id": drive_file["id"] if drive_file else None,
+            "web_view_link": drive_file["webViewLink"] if drive_file else None,
+            "outcome": outcome,
+            "error": error,
+            "attempts": job["attempts"],
+            "duration": duration,
+            "created_at": datetime.now(timezone.utc),
+        }
+    )
+    if len(_pending) >= HISTORY_BATCH_SIZE:
+        _wakeup.set()
+
+
+async def _flush() -> None:
+    while _pending:
+        batch = [
+            _pending.popleft() for _ in range(min(len(_pending), HISTORY_BATCH_SIZE))
+        ]
+        try:
+            await insert_upload_history(batch)
+        except Exception as error:
+            if not isinstance(error, CircuitOpenError) and not is_outage(error):
+                # The rows themselves are bad; writing them again won't help
+                logging.exception("Dropping %s upload history rows", len(batch))
+                continue
+            logging.warning(
+                "Failed to write %s upload history rows: %r", len(batch), error
+            )
+            # Put them back for the next flush, unless newer rows filled up
+            room = HISTORY_MAX_PENDING - len(_pending)
+            _pending.extendleft(reversed(batch[:room]))
+            return
+
+
+async def _run() -> None:
+    while True:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), HISTORY_FLUSH_INTERVAL)
+        except TimeoutError:
+            pass
+        _wakeup.clear()
+        await _flush()
+        if _stopping:
+            return
+
+
+def start_history_writer() -> None:
+    """Write recorded uploads in the background every HISTORY_FLUSH_INTERVAL."""
+    global _task, _stopping
+    _stopping = False
+    _task = asyncio.create_task(_run(), name="upload-history")
+
+
+async def stop_history_writer(timeout: float) -> None:
+    """Write what's left, for up to `timeout` seconds, and stop the writer."""
+    global _task, _stopping
+    if _task is None:
+        return
+    _stopping = True
+    _wakeup.set()
+    try:
+        await asyncio.wait_for(_task, timeout)
+    except TimeoutError:
+        pass
+    _task = None
+    if _pending:
+        logging.warning("Dropping %s unwritten upload history rows", len(_pending))